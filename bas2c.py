@@ -181,6 +181,11 @@ class BasKeyword:
     @classmethod
     def exfninit(cls, fh):
         """組込/外部関数定義情報をファイルから読み込む"""
+        # 読み直す場合は前回読み込んだ定義を取り除く
+        if not hasattr(cls, 'keyword0'):
+            cls.keyword0 = dict(cls.keyword)
+        cls.keyword = dict(cls.keyword0)
+        cls.exfnlist = {}
         grp = ''
         w = 5000
         while l := fh.readline():
@@ -191,7 +196,8 @@ class BasKeyword:
             if not m:
                 continue
             cls.keyword[m.group(2)] = w
-            cls.exfnlist[w] = BasExFunc(m.group(1),m.group(2),m.group(3),m.group(4),m.group(5),grp)
+            cls.exfnlist[w] = BasExFunc(m.group(1),m.group(2),m.group(3),m.group(4),m.group(5),grp,
+                                        l[m.end():].split()[:1] == ['pure'])
             w += 1
 
 class BasException1(Exception):
@@ -204,13 +210,14 @@ class BasException2(Exception):
 
 class BasExFunc:
     """組込/外部関数定義情報を保持するクラス"""
-    def __init__(self, type, name, arg, cfunc, carg, group):
+    def __init__(self, type, name, arg, cfunc, carg, group, pure=False):
         self.type = type        # 戻り値の型
         self.name = name        # 関数名
         self.arg = arg          # 引数の型
         self.cfunc = cfunc      # C関数名
         self.carg = carg        # C引数の型
         self.group = group      # グループ名 (BASIC/MOUSE/STICK/..)
+        self.pure = pure        # 副作用がなく、引数だけで値が決まる関数か
 
 class BasVariable:
     """変数/関数の型と名前を保持するクラス"""
@@ -394,6 +401,7 @@ class BasTokenGen:
     def __init__(self, fh=sys.stdin, cindent=-1, verbose=False):
         self.cindent = cindent
         self.verbose = verbose
+        self.srclines = None    # pass 1で読んだソースコード (インクリメンタル変換用)
         if fh == sys.stdin:
             # 標準入力は巻き戻せないので一度すべてを読み込む
             self.filebuf = ''
@@ -451,6 +459,8 @@ class BasTokenGen:
 
             self.lineno += 1
             self.baslineno += 1
+            if self.srclines != None and self.bpass == 1:
+                self.srclines.append(self.line)
             if self.cindent >= 0 and len(self.line) > 0:
                 self.ccode += '\t' * self.cindent + '/*===' + self.getbascmnline(self.line) + '===*/\n'
             if self.verbose and self.bpass == 2:
@@ -590,6 +600,26 @@ class BasTokenGen:
         self.cached.append(t)
         return t
 
+    def fetchint(self):
+        """次のトークンが ',' か '}' の前にある10進数の整数定数なら取得する (配列の初期値用)"""
+        if self.cached or not (m := re.match(r'[ \t]*(-?)0*(\d)(\d*)[ \t]*([,}])', self.line)):
+            return None
+        self.prelen = self.curlen
+        self.line = self.line[m.end(3):]       # 区切りの ',' '}' は通常のトークンとして読ませる
+        self.curlen = len(self.line)
+        return m.group(1) + m.group(2) + m.group(3)
+
+    def skipto(self, lineno):
+        """lineno行目までを変換せずに読み飛ばす"""
+        self.cached = []
+        self.line = ''
+        while self.lineno < lineno:
+            if not self.getline():
+                break
+            self.line = ''
+        self.ccode = ''
+        self.golineno = 0
+
     def skip(self):
         """次の命令が来るまでトークンを読み飛ばす"""
         while True:
@@ -601,6 +631,129 @@ class BasTokenGen:
 
 ##############################################################################
 
+class BasCLine:
+    """変換後のCソースコード1行分を保持するクラス"""
+    CCODE    = 0        # #c～#endcのコード、BASICの行コメント
+    LABEL    = 1        # GOTO飛び先のラベル、GOSUB飛び先の関数定義
+    STMT     = 2        # 文の変換結果
+
+    def __init__(self, kind, text, indent=0, lineno=0):
+        self.kind = kind
+        self.text = text
+        self.indent = indent
+        self.lineno = lineno
+
+    def output(self):
+        """出力するCソースコードを得る"""
+        if self.kind == self.STMT:
+            return '\t' * self.indent + self.text + '\n'
+        return self.text
+
+    def __repr__(self):
+        return f'({self.kind},{self.indent},{self.lineno},{self.text!r})'
+
+class BasUsing:
+    """print using の書式文字列を解析するクラス"""
+    def __init__(self, fmt):
+        self.items = []         # リテラル文字列または書式フィールド
+        self.valid = True       # 変換時に扱えない書式を含んでいたらFalse
+        self.parse(fmt)
+
+    def parse(self, fmt):
+        lit = ''
+        i = 0
+        while i < len(fmt):
+            c = fmt[i]
+            if c == '\\' or c == '^':     # 通貨記号と指数表示は扱わない
+                self.valid = False
+                return
+            if c == '!':                    # 文字列の先頭1文字
+                f = ('S', 1)
+                i += 1
+            elif c == '&' and (j := fmt.find('&', i + 1)) > 0 and fmt[i + 1:j].strip() == '':
+                f = ('S', j - i + 1)        # & & で囲まれた幅の文字列
+                i = j + 1
+            elif m := re.match(r'(\+?)(\*\*)?([#,]*)(\.#*)?([+-]?)', fmt[i:]):
+                if not (m.group(2) or '#' in m.group(3) or (m.group(4) and len(m.group(4)) > 1)):
+                    lit += c
+                    i += 1
+                    continue
+                lead = m.group(1) == '+'
+                trail = m.group(5) if not lead else ''
+                f = ('N', { 'width': len(m.group(0)) - (len(m.group(5)) if lead else 0),
+                            'left': len(m.group(2) or '') + len(m.group(3)),
+                            'point': m.group(4) != None,
+                            'dec': len(m.group(4) or '.') - 1,
+                            'comma': ',' in m.group(3),
+                            'star': m.group(2) != None,
+                            'lead': lead,
+                            'trail': trail,
+                            'src': m.group(0)[:len(m.group(0)) - (len(m.group(5)) if lead else 0)] })
+                i += len(f[1]['src'])
+            else:
+                lit += c
+                i += 1
+                continue
+            if lit:
+                self.items.append(('L', lit))
+                lit = ''
+            self.items.append(f)
+        if lit:
+            self.items.append(('L', lit))
+
+    def fields(self):
+        """書式フィールドの数を返す"""
+        return len([f for f in self.items if f[0] != 'L'])
+
+    def fmtnum(self, f, v):
+        """数値を書式フィールドに従って文字列化する"""
+        neg = v < 0
+        s = '%.*f' % (f['dec'], abs(v))
+        ip, _, fp = s.partition('.')
+        if f['comma']:
+            ip = re.sub(r'(\d)(?=(\d{3})+$)', r'\1,', ip)
+        if f['left'] == 0 and ip == '0':
+            ip = ''
+        r = ip + ('.' + fp if f['point'] else '')
+        if f['lead']:
+            r = ('-' if neg else '+') + r
+        elif f['trail'] == '+':
+            r += '-' if neg else '+'
+        elif f['trail'] == '-':
+            r += '-' if neg else ' '
+        elif neg:
+            r = '-' + r
+        if len(r) > f['width']:
+            return '%' + r                  # 桁あふれ
+        return ('*' if f['star'] else ' ') * (f['width'] - len(r)) + r
+
+    def format(self, args):
+        """定数の引数を書式に従って文字列化する (変換できなければNone)"""
+        if not self.valid or len(args) != self.fields():
+            return None
+        r = ''
+        args = list(args)
+        for f in self.items:
+            if f[0] == 'L':
+                r += f[1]
+                continue
+            a = args.pop(0)
+            if f[0] == 'S':
+                if not isinstance(a, str) or not a.isascii() or a == '':
+                    return None
+                r += a[:f[1]].ljust(f[1])
+            else:
+                if isinstance(a, str):
+                    return None
+                if isinstance(a, float):
+                    # 丸めが必要になる値は実行時の処理に任せる
+                    if a != float('%.*f' % (f[1]['dec'], a)):
+                        return None
+                r += self.fmtnum(f[1], a)
+        return r
+
+##############################################################################
+
 class Bas2C:
     DEBUG       = (1 << 0)      # デバッグモード
     UNDEFERR    = (1 << 1)      # 未定義関数呼び出しをエラーにする
@@ -608,9 +761,50 @@ class Bas2C:
     BASCOMMENT  = (1 << 3)      # BASICの各行をコメント行として挿入する
     VERBOSE     = (1 << 4)      # 変換中の行を表示する
     BCCOMPAT    = (1 << 5)      # 演算子の優先順位や論理演算の結果を変換しない(BC.Xコンパチ)
+    PEEPHOLE    = (1 << 6)      # PRINT文の出力をまとめ、重複する文字列定数を共有する
+    STRAPPEND   = (1 << 7)      # a$ = a$ + .. をバッファへの追加にする
+    REPORT      = (1 << 8)      # 最適化の内容を表示する
+    DEADCODE    = (1 << 9)      # 実行されないコードや使われない変数/関数を削除する
+    STRUCTURE   = (1 << 10)     # GOTOによるループや分岐をwhile/do/ifに変換する
+    INLINE      = (1 << 11)     # 小さな関数やサブルーチンを呼び出し箇所に展開する
+    PROFILE     = (1 << 12)     # BASICの各行の実行回数を数えるコードを挿入する
+    PASS1STOP   = (1 << 13)     # pass 1でエラーがあったらpass 2を行わない
+    INTARITH    = (1 << 14)     # 値が整数になる実数演算を整数演算にする
+    ROWBASE     = (1 << 15)     # ループ内で不変な配列の行アドレスをループの外で求める
+    ARITH       = (1 << 16)     # 2のべき乗の定数による乗除算と剰余をシフトとマスクにする
+    CSE         = (1 << 17)     # 文の中で同じ値を何度も求める式を一時変数にまとめる
+    LICM        = (1 << 18)     # ループ内で値が変わらない式をループの外で求める
+    USINGFMT    = (1 << 19)     # 定数の print using の書式を変換時に解析する
+    STRCMP      = (1 << 20)     # 文字列定数との比較を b_strcmp() を使わないコードにする
+
+    # -O で有効になる最適化
+    OPTIMIZE    = PEEPHOLE | STRAPPEND | DEADCODE | STRUCTURE | INLINE | INTARITH | ROWBASE | ARITH | CSE | LICM | USINGFMT | STRCMP
+
+    # -O<最適化名> で指定できる最適化
+    optnames = {
+        'print'     : PEEPHOLE,
+        'strapp'    : STRAPPEND,
+        'dce'       : DEADCODE,
+        'struct'    : STRUCTURE,
+        'inline'    : INLINE,
+        'int'       : INTARITH,
+        'array'     : ROWBASE,
+        'arith'     : ARITH,
+        'cse'       : CSE,
+        'licm'      : LICM,
+        'using'     : USINGFMT,
+        'strcmp'    : STRCMP,
+    }
 
-    def __init__(self, fh, flag=0, cindent=0):
+    def __init__(self, fh, flag=0, cindent=0, inlinesize=8, incremental=None, maxerrors=0, diag=None, split=None):
         self.flag = flag
+        self.split = split                  # 分割して出力するファイル名 (拡張子を除く)
+        self.outfiles = []                  # 分割して出力したファイル
+        self.maxerrors = maxerrors          # 変換を中止するエラーの数 (0なら中止しない)
+        self.diag = diag                    # JSON形式のエラー情報の出力先
+        self.cindent = cindent
+        self.inlinesize = inlinesize
+        self.incremental = incremental      # インクリメンタル変換の結果を保存するファイル (またはdict)
         self.fh = fh
         self.t = BasTokenGen(fh, cindent if flag & self.BASCOMMENT else -1, flag & self.VERBOSE)
         self.label = []
@@ -619,9 +813,14 @@ class Bas2C:
         self.strtmp = 0
         self.strtmp_max = 0
         self.exfngroup = set()
+        self.extdef = {}
         self.setpass(0)
         self.b_exit = 'b_exit' if not (flag & self.NOBINIT) else 'exit'
         self.exitstatus = 0
+        self.errcount = 0
+        self.stmtlineno = 0
+        self.funclines = []     # func文のある行 (インクリメンタル変換用)
+        self.linemap = {}       # BASICの行番号とソースコードの行の対応 (インクリメンタル変換用)
 
     def setpass(self, bpass):
         """変換パスを設定する"""
@@ -630,6 +829,7 @@ class Bas2C:
         self.nsp.setpass(bpass)
         self.nsp.setlocal(None)
         self.initmp = 0
+        self.initmps = {}       # 配列の初期値テーブルの内容のハッシュ値と名前の対応
         self.nest = 'M'
         self.indentcnt = 0
         self.t.setpass(bpass)
@@ -675,7 +875,7 @@ class Bas2C:
     def gendefine(self):
         """グローバル変数、関数の定義を出力する"""
         r = self.nsp.definition()
-        for l in self.subr:         # サブルーチンのプロトタイプを出力する
+        for l in sorted(set(self.subr)):    # サブルーチンのプロトタイプを行番号順に出力する
             r += f'void S{l:06d}(void);\n'
         return r
 
@@ -685,7 +885,7 @@ class Bas2C:
 
     def nestout(self, type):
         """ネストを浅くする"""
-        self.expect(self.nest[0] == type, self.nesterrmsg(type))
+        self.expect(self.nest[:1] == type, self.nesterrmsg(type))
         self.nest = self.nest[1:]
         self.indentcnt -= 1
 
@@ -744,15 +944,242 @@ class Bas2C:
                 return r + f'void S{l:06d}(void)\n' + '{\n'
         return ''
 
+    def constvalue(self, x):
+        """トークンが定数であればその値を返す (定数でなければNone)"""
+        v = x.value
+        while m := re.match(r'\((.*)\)$', v):
+            v = m.group(1)
+        if x.istype(BasToken.STR):
+            if re.match(r'"[^"]*"$', v):
+                return v[1:-1].replace('\\\\', '\\')
+        elif x.istype(BasToken.FLOAT):
+            if m := re.match(r'([+-]?)\(double\)([\d.]+([eE]\d+)?)$', v):
+                return float(m.group(1) + m.group(2))
+        elif x.istype(BasToken.INT):
+            if m := re.match(r'([+-]?)(0x[0-9a-fA-F]+|0b[01]+|0[0-7]*|[1-9]\d*)$', v):
+                n = m.group(2)
+                n = int(n, 16 if n[:2] == '0x' else 2 if n[:2] == '0b' else 8 if n[0] == '0' else 10)
+                return -n if m.group(1) == '-' else n
+            if m := re.match(r"'(.)'$", v):
+                return ord(m.group(1))
+        return None
+
+    def usingconst(self, fmt, args):
+        """print using の書式と引数が定数なら変換結果の文字列定数を返す"""
+        f = self.constvalue(fmt)
+        a = [self.constvalue(x) for x in args]
+        if f == None or None in a:
+            return None
+        if (r := BasUsing(f).format(a)) == None:
+            return None
+        return '"' + r.replace('\\', '\\\\') + '"'
+
+    def usingspec(self, lp, buf, fmt, args):
+        """print using の書式が定数なら、書式フィールドごとに文字列化して出力するコードを返す"""
+        f = self.constvalue(fmt)
+        if f == None:
+            return None
+        u = BasUsing(f)
+        if not u.valid or u.fields() != len(args):
+            return None
+        # 引数は書式フィールドごとに順に評価されるので、関数呼び出しのある引数は扱わない
+        pure = self.purefuncs()
+        for x in args:
+            if [n for n in re.findall(r'\b(\w+)\s*\(', x.value) if n not in pure]:
+                return None
+        r = ''
+        size = 0
+        args = list(args)
+        for i in u.items:
+            if i[0] == 'L':
+                r += f'b_s{lp}print("{i[1].replace(chr(92), chr(92) * 2)}");\n'
+                size += len(i[1])
+                continue
+            x = args.pop(0)
+            if i[0] == 'S':
+                if not x.istype(BasToken.STR):
+                    return None
+                r += f'b_s{lp}print(_usings({buf},{x.value},{i[1]}));\n'
+                size += i[1]
+            elif x.istype(BasToken.INT) or x.istype(BasToken.CHAR):
+                # 整数の引数は実数に変換せずに文字列化する
+                n = i[1]
+                flags = (1 if n['point'] else 0) | (2 if n['comma'] else 0) | (4 if n['star'] else 0) | \
+                        (8 if n['lead'] else 0) | { '': 0, '+': 16, '-': 32 }[n['trail']]
+                r += f'b_s{lp}print(_usingi({buf},{x.value},{n["width"]},{n["left"]},{n["dec"]},{flags}));\n'
+                size += n['width'] + n['dec'] + 20
+            elif x.istype(BasToken.FLOAT):
+                r += f'b_s{lp}print(using({buf},"{i[1]["src"]}",{x.value}));\n'
+                size += i[1]['width'] + i[1]['dec'] + 20
+            else:
+                return None
+        if size > 255:
+            return None         # using() が出力を切り詰める可能性がある場合は扱わない
+        if '_usings(' in r:
+            self.extdef['_usings'] = \
+                '\nstatic unsigned char *_usings(unsigned char *buf, unsigned char *s, int n)\n{\n' \
+                '\tint i;\n' \
+                '\tfor (i = 0; i < n; i++)\n\t\tbuf[i] = *s ? *s++ : \' \';\n' \
+                '\tbuf[n] = \'\\0\';\n' \
+                '\treturn buf;\n}\n'
+        if '_usingi(' in r:
+            self.extdef['_usingi'] = \
+                '\nstatic unsigned char *_usingi(unsigned char *buf, int v, int width, int left, int dec, int flags)\n{\n' \
+                '\tunsigned char num[12], r[48];\n' \
+                '\tunsigned int u = v < 0 ? -(unsigned int)v : v;\n' \
+                '\tint i, j = 0, n = 0;\n' \
+                '\tdo {\n\t\tnum[n++] = \'0\' + u % 10;\n\t\tu /= 10;\n\t} while (u);\n' \
+                '\tif (flags & 8)\n\t\tr[j++] = v < 0 ? \'-\' : \'+\';\n' \
+                '\telse if (v < 0 && !(flags & 48))\n\t\tr[j++] = \'-\';\n' \
+                '\tif (!(left == 0 && v == 0))\n' \
+                '\t\tfor (i = n - 1; i >= 0; i--) {\n' \
+                '\t\t\tr[j++] = num[i];\n' \
+                '\t\t\tif ((flags & 2) && i > 0 && i % 3 == 0)\n\t\t\t\tr[j++] = \',\';\n' \
+                '\t\t}\n' \
+                '\tif (flags & 1)\n\t\tfor (r[j++] = \'.\'; dec > 0; dec--)\n\t\t\tr[j++] = \'0\';\n' \
+                '\tif (flags & 16)\n\t\tr[j++] = v < 0 ? \'-\' : \'+\';\n' \
+                '\telse if (flags & 32)\n\t\tr[j++] = v < 0 ? \'-\' : \' \';\n' \
+                '\tn = 0;\n' \
+                '\tif (j > width)\n\t\tbuf[n++] = \'%\';              /* 桁あふれ */\n' \
+                '\tfor (i = j; i < width; i++)\n\t\tbuf[n++] = (flags & 4) ? \'*\' : \' \';\n' \
+                '\tmemcpy(&buf[n], r, j);\n' \
+                '\tbuf[n + j] = \'\\0\';\n' \
+                '\treturn buf;\n}\n'
+        return r
+
+    def strcmpspec(self, x, op, y):
+        """文字列定数との比較を b_strcmp() を使わない条件式にする (できなければNone)"""
+        if self.constvalue(x) != None and self.constvalue(y) == None:
+            x, y = y, x                     # 定数を右辺にする
+            op = { '>': '<', '<': '>', '>=': '<=', '<=': '>=' }.get(op, op)
+        s = self.constvalue(y)
+        if s == None or not s.isascii():
+            return None
+        v = x.value
+        if s == '':
+            # 空文字列との比較は先頭の文字だけを調べる
+            op = { '>': '!=', '<=': '==' }.get(op, op)
+            return f'{v}[0] {op} 0' if op in ('==', '!=') else None
+        if op not in ('==', '!='):
+            return None
+        lit = '"' + s.replace('\\', '\\\\') + '"'
+        if re.search(r'\w\s*\(|\+\+|--|[^=!<>]=[^=]', v):
+            return f'strcmp({v}, {lit}) {op} 0'     # 2回評価できない式は先頭の文字を調べない
+        # 先頭の文字を比べてから、残りを比べる
+        c = s[0]
+        c = f"'{c}'" if c.isprintable() and c not in '\'\\' else f'0x{ord(c):02x}'
+        if len(s) == 1:
+            rest = f'{v}[1] {op} 0'
+        else:
+            rest = f'strcmp(&{v}[1], "{s[1:].replace(chr(92), chr(92) * 2)}") {op} 0'
+        if op == '==':
+            return f'{v}[0] == {c} && {rest}'
+        return f'{v}[0] != {c} || {rest}'
+
+    def pow2(self, x):
+        """xが2以上の2のべき乗の整数定数ならその指数を返す"""
+        if x.type == BasToken.INT and (self.flag & Bas2C.ARITH):
+            n = self.constvalue(x)
+            if n != None and n >= 2 and (n & (n - 1)) == 0:
+                return n.bit_length() - 1
+        return None
+
+    def nonneg(self, x):
+        """式の値が負にならないことが分かっていればTrue"""
+        if getattr(x, 'nonneg', False):
+            return True
+        n = self.constvalue(x)
+        return n != None and not isinstance(n, str) and n >= 0
+
+    def intoperand(self, x):
+        """整数演算のオペランドとして使う式を得る (式が2回評価されてもよいかも返す)"""
+        v = x.value if x.type in (BasToken.INT, BasToken.CHAR) else f'(int){x.value}'
+        if re.fullmatch(r'[\w\[\]]+', x.value):
+            return v, True          # 変数、定数、単純な配列要素
+        return f'({v})', False
+
+    def intassign(self, s, x):
+        """整数型変数 s に代入する式 x を得る (実数演算を整数演算にできるならそうする)"""
+        if x.type != BasToken.FLOAT or not (self.flag & Bas2C.INTARITH):
+            return x.value
+        if (iv := self.intvalue(x)) != None:
+            if self.bpass == 2:
+                self.report(f'{s.name} への代入を整数演算に変換しました', self.stmtlineno)
+            return iv
+        if self.bpass == 2 and [n for n in self.nest if n in 'fwr']:
+            self.report(f'ループ内で {s.name} への代入に実数演算が使われています', self.stmtlineno)
+        return x.value
+
+    def intvalue(self, x):
+        """式の値が整数であれば、整数演算で同じ値を得るCの式を返す (整数でなければNone)"""
+        if x.type == BasToken.INT or x.type == BasToken.CHAR:
+            return x.value
+        if x.type == BasToken.FLOAT and (self.flag & Bas2C.INTARITH):
+            return getattr(x, 'ival', None)
+        return None
+
+    def intbound(self, x):
+        """整数演算で得る式の値の絶対値の上限を返す (分からなければNone)"""
+        if x.type == BasToken.CHAR:
+            return 255
+        if (n := self.constvalue(x)) != None and not isinstance(n, str):
+            return abs(n)
+        return getattr(x, 'ibound', None)
+
+    def intop(self, r, op, a):
+        """実数型になる二項演算 r op a を整数演算で行うCの式を得る (値が整数にならなければNone)"""
+        ir = self.intvalue(r)
+        ia = self.intvalue(a)
+        if ir == None or ia == None:
+            return None
+        v = f'{ir} {op} {ia}'
+        return v if (self.flag & Bas2C.BCCOMPAT) else f'({v})'
+
     def updatestrtmp(self):
         """文字列処理用一時変数の最大数を更新する"""
         self.strtmp_max = max(self.strtmp, self.strtmp_max)
         self.strtmp = 0
 
+    # 文の予約語と、その文を変換するメソッド名の対応
+    # (新しい文を追加する場合はここにメソッド名を登録する。登録されていない予約語は外部関数の呼び出しとみなす)
+    stmttable = {
+        BasKeyword.EOL       : 'stmteol',
+        BasKeyword.DIM       : 'stmtdim',
+        BasKeyword.PRINT     : 'stmtprint',
+        BasKeyword.LPRINT    : 'stmtprint',
+        BasKeyword.INPUT     : 'stmtinput',
+        BasKeyword.LINPUT    : 'stmtlinput',
+        BasKeyword.IF        : 'stmtif',
+        BasKeyword.ELSE      : 'stmtelse',
+        BasKeyword.FOR       : 'stmtfor',
+        BasKeyword.NEXT      : 'stmtnext',
+        BasKeyword.WHILE     : 'stmtwhile',
+        BasKeyword.ENDWHILE  : 'stmtendwhile',
+        BasKeyword.REPEAT    : 'stmtrepeat',
+        BasKeyword.UNTIL     : 'stmtuntil',
+        BasKeyword.SWITCH    : 'stmtswitch',
+        BasKeyword.CASE      : 'stmtcase',
+        BasKeyword.DEFAULT   : 'stmtdefault',
+        BasKeyword.ENDSWITCH : 'stmtendswitch',
+        BasKeyword.GOTO      : 'stmtgoto',
+        BasKeyword.GOSUB     : 'stmtgosub',
+        BasKeyword.FUNC      : 'stmtfunc',
+        BasKeyword.ENDFUNC   : 'stmtendfunc',
+        BasKeyword.RETURN    : 'stmtreturn',
+        BasKeyword.BREAK     : 'stmtbreak',
+        BasKeyword.CONTINUE  : 'stmtcontinue',
+        BasKeyword.LOCATE    : 'stmtlocate',
+        BasKeyword.ERROR     : 'stmterror',
+        BasKeyword.END       : 'stmtend',
+    }
+
     def statement(self):
         """X-BASICの文を1つ読み込んで変換する"""
         while self.checksymbol(':'):
             pass
+        self.stmtlineno = self.t.lineno     # 文の開始行
+        if self.bpass == 1 and self.t.golineno:
+            self.linemap[self.t.golineno] = self.t.lineno
         if self.checkkeyword(BasKeyword.EOF):
             return None
 
@@ -764,347 +1191,411 @@ class Bas2C:
             return ''
 
         elif s := self.checktype(BasToken.KEYWORD):
-            if s.value == BasKeyword.EOL:
-                if self.nest != '':
-                    if self.nest[0] in 'ie':    # then/else節が改行で終了する場合
-                        self.nestout(self.nest[0])
-                        return '}\n'
-                return ''
-
-            elif s.value == BasKeyword.DIM:
-                ty = BasVariable.INT
-                if t := self.checkvartype():
-                    ty = t.value
-                self.defvar(ty)
-                return ''
-
-            elif s.value == BasKeyword.PRINT or s.value == BasKeyword.LPRINT:
-                lp = '' if s.value == BasKeyword.PRINT else 'l'
-                r = ''
-                crlf = True
-                if self.checkkeyword(BasKeyword.USING):
-                    fmt = self.expect(self.expr(), 'using の書式文字列がありません')
-                    self.expect(fmt.istype(BasToken.STR), 'using の書式文字列がありません')
-                    self.nextsymbol(';')
-                    r = f'b_s{lp}print(using(strtmp{self.strtmp},{fmt.value}'
-                    self.strtmp += 1
-                    while True:
-                        if x := self.expr():
-                            if x.istype(BasToken.STR):
-                                r += f',{x.value}'
-                            else:
-                                r += f',(double)({x.value})'
-                        if not self.checksymbol(','):
-                            break
-                    r += '));\n'
-                    crlf = not self.checksymbol(';')
-                else:
-                    while True:
-                        if x := self.expr():
-                            if x.istype(BasToken.STR):
-                                r += f'b_s{lp}print({x.value});\n'
-                            elif x.istype(BasToken.FLOAT):
-                                r += f'b_f{lp}print({x.value});\n'
-                            else:
-                                r += f'b_i{lp}print({x.value});\n'
-                            crlf = True
-                        elif self.checkkeyword(BasKeyword.TAB):
-                            self.nextsymbol('(')
-                            x = self.expect(self.expr())
-                            self.nextsymbol(')')
-                            r += f'b_t{lp}print({x.value});\n'
-                            crlf = True
-
-                        if self.checksymbol(';'):
-                            crlf = False
-                        elif self.checksymbol(','):
-                            r += f'b_s{lp}print(STRTAB);\n'
-                            crlf = False
-                        else:
-                            break
-                if crlf:
-                    r += f'b_s{lp}print(STRCRLF);\n'
-                return r
-
-            elif s.value == BasKeyword.INPUT:
-                pstr = '"? "'
-                if p := self.checktype(BasToken.STR):
-                    pstr = p.value
-                    if self.checksymbol(';'):
-                        pstr += ' "? "'
-                    else:
-                        self.nextsymbol(',')
-                r = f'b_input({pstr:s}'
+            if h := self.stmttable.get(s.value):
+                return getattr(self, h)(s)
+            elif r := self.exfncall(s.value):
+                return r.value + ';\n'
+            else:
+                self.expect(None)
 
-                while True:
-                    a = self.expect(self.lvalue())
-                    if a.type == BasVariable.STR:
-                        at = f'sizeof({a.name})'
-                        av = a.name
-                    else:
-                        map = {BasVariable.INT:0x204, BasVariable.CHAR:0x201, BasVariable.FLOAT:0x208}
-                        at = f'0x{map[a.type]:x}'
-                        av = '&'+a.name
-                    r += f',{at},{av}'
-                    if not self.checksymbol(','):
-                        break
-                r += ',-1);\n'
-                return r
+        elif s := self.checktype(BasToken.SYMBOL):
+            if s.value == '}':
+                return self.stmtblockend(s)
 
-            elif s.value == BasKeyword.LINPUT:
-                r = ''
-                if p := self.checktype(BasToken.STR):
-                    self.nextsymbol(';')
-                    r += f'b_sprint({p.value});\n'
-                a = self.expect(self.lvalue())
-                self.expect(a.type == BasVariable.STR)
-                return r + f'b_linput({a.name},sizeof({a.name}));\n'
+        elif s := self.checktype(BasToken.COMMENT):
+            return s.value
 
-            elif s.value == BasKeyword.IF:
-                x = self.expect(self.expr())
-                self.nextkeyword(BasKeyword.THEN)
-                self.nestin('I' if self.checksymbol('{') else 'i')
-                return f'if ({x.value}) ' + '{\n'
-
-            elif s.value == BasKeyword.ELSE:
-                r = ''
-                if self.nest[0] == 'e':         # ネスト内側のelse節が終了する
-                    self.nestout('e')
-                    r += '}\n'
-                self.nestout('i')
-                if self.checkkeyword(BasKeyword.IF):    # else if が続く場合
-                    x = self.expect(self.expr())
-                    self.nextkeyword(BasKeyword.THEN)
-                    self.nestin('I' if self.checksymbol('{') else 'i')
-                    return r + '} else ' + f'if ({x.value}) ' + '{\n'
-                else:                                   # else で終了する場合
-                    self.nestin('E' if self.checksymbol('{') else 'e')
-                    return r + '} else {\n'
-
-            elif s.value == BasKeyword.FOR:
-                v = self.expect(self.lvalue(isfor=True))
-                self.nextkeyword(BasKeyword.EQ)
-                f = self.expect(self.expr())
-                self.nextkeyword(BasKeyword.TO)
-                t = self.expect(self.expr())
-                self.nestin('f')
-                return f'for ({v.name} = {f.value}; {v.name} <= {t.value}; {v.name}++) ' + '{\n'
-
-            elif s.value == BasKeyword.NEXT:
-                self.nestout('f')
-                return '}\n'
+        else:
+            return self.stmtlet(self.t.fetch())
 
-            elif s.value == BasKeyword.WHILE:
-                x = self.expect(self.expr())
-                self.nestin('w')
-                return f'while ({x.value}) ' + '{\n'
+        self.expect(None)
 
-            elif s.value == BasKeyword.ENDWHILE:
-                self.nestout('w')
+    def stmteol(self, s):
+        """行末"""
+        if self.nest != '':
+            if self.nest[0] in 'ie':    # then/else節が改行で終了する場合
+                self.nestout(self.nest[0])
                 return '}\n'
+        return ''
 
-            elif s.value == BasKeyword.REPEAT:
-                self.nestin('r')
-                return 'do {\n'
-
-            elif s.value == BasKeyword.UNTIL:
-                x = self.expect(self.expr())
-                self.nestout('r')
-                return '} ' + f'while (!({x.value}));\n'
-
-            elif s.value == BasKeyword.SWITCH:
-                x = self.expect(self.expr())
-                self.nestin('s')
-                return f'switch ({x.value}) ' + '{\n'
-
-            elif s.value == BasKeyword.CASE:
-                x = self.expect(self.expr())
-                self.indentcnt -= 1
-                return f'case {x.value}:\n'
+    def stmtdim(self, s):
+        """dim文"""
+        ty = BasVariable.INT
+        if t := self.checkvartype():
+            ty = t.value
+        self.defvar(ty)
+        return ''
 
-            elif s.value == BasKeyword.DEFAULT:
-                self.indentcnt -= 1
-                return 'default:\n'
+    def stmtprint(self, s):
+        """print/lprint文"""
+        lp = '' if s.value == BasKeyword.PRINT else 'l'
+        r = ''
+        crlf = True
+        if self.checkkeyword(BasKeyword.USING):
+            fmt = self.expect(self.expr(), 'using の書式文字列がありません')
+            self.expect(fmt.istype(BasToken.STR), 'using の書式文字列がありません')
+            self.nextsymbol(';')
+            buf = f'strtmp{self.strtmp}'
+            r = f'b_s{lp}print(using({buf},{fmt.value}'
+            self.strtmp += 1
+            args = []
+            while True:
+                if x := self.expr():
+                    if x.istype(BasToken.STR):
+                        r += f',{x.value}'
+                    else:
+                        r += f',(double)({x.value})'
+                    args.append(x)
+                if not self.checksymbol(','):
+                    break
+            r += '));\n'
+            if self.flag & Bas2C.PEEPHOLE and (f := self.usingconst(fmt, args)):
+                # 書式と引数がすべて定数なら変換時に文字列化する
+                r = f'b_s{lp}print({f});\n'
+            elif self.flag & Bas2C.USINGFMT and (f := self.usingspec(lp, buf, fmt, args)):
+                # 書式が定数なら実行時に書式文字列を解析しないようにする
+                r = f
+            crlf = not self.checksymbol(';')
+        else:
+            while True:
+                if x := self.expr():
+                    if x.istype(BasToken.STR):
+                        r += f'b_s{lp}print({x.value});\n'
+                    elif x.istype(BasToken.FLOAT):
+                        r += f'b_f{lp}print({x.value});\n'
+                    else:
+                        r += f'b_i{lp}print({x.value});\n'
+                    crlf = True
+                elif self.checkkeyword(BasKeyword.TAB):
+                    self.nextsymbol('(')
+                    x = self.expect(self.expr())
+                    self.nextsymbol(')')
+                    r += f'b_t{lp}print({x.value});\n'
+                    crlf = True
+
+                if self.checksymbol(';'):
+                    crlf = False
+                elif self.checksymbol(','):
+                    r += f'b_s{lp}print(STRTAB);\n'
+                    crlf = False
+                else:
+                    break
+        if crlf:
+            r += f'b_s{lp}print(STRCRLF);\n'
+        return r
 
-            elif s.value == BasKeyword.ENDSWITCH:
-                self.nestout('s')
-                return '}\n'
+    def stmtinput(self, s):
+        """input文"""
+        pstr = '"? "'
+        if p := self.checktype(BasToken.STR):
+            pstr = p.value
+            if self.checksymbol(';'):
+                pstr += ' "? "'
+            else:
+                self.nextsymbol(',')
+        r = f'b_input({pstr:s}'
 
-            elif s.value == BasKeyword.GOTO:
-                l = int(self.nexttype(BasToken.INT))
-                if self.bpass == 1:
-                    self.label.append(l)
-                return f'goto L{l:06d};\n'
+        while True:
+            a = self.expect(self.lvalue())
+            if a.type == BasVariable.STR:
+                at = f'sizeof({a.name})'
+                av = a.name
+            else:
+                map = {BasVariable.INT:0x204, BasVariable.CHAR:0x201, BasVariable.FLOAT:0x208}
+                at = f'0x{map[a.type]:x}'
+                av = '&'+a.name
+            r += f',{at},{av}'
+            if not self.checksymbol(','):
+                break
+        r += ',-1);\n'
+        return r
 
-            elif s.value == BasKeyword.GOSUB:
-                l = int(self.nexttype(BasToken.INT))
-                if self.bpass == 1:
-                    self.subr.append(l)
-                return f'S{l:06d}();\n'
+    def stmtlinput(self, s):
+        """linput文"""
+        r = ''
+        if p := self.checktype(BasToken.STR):
+            self.nextsymbol(';')
+            r += f'b_sprint({p.value});\n'
+        a = self.expect(self.lvalue())
+        self.expect(a.type == BasVariable.STR)
+        return r + f'b_linput({a.name},sizeof({a.name}));\n'
+
+    def stmtif(self, s):
+        """if文"""
+        x = self.expect(self.expr())
+        self.nextkeyword(BasKeyword.THEN)
+        self.nestin('I' if self.checksymbol('{') else 'i')
+        return f'if ({x.value}) ' + '{\n'
+
+    def stmtelse(self, s):
+        """else節"""
+        r = ''
+        if self.nest[:1] == 'e':       # ネスト内側のelse節が終了する
+            self.nestout('e')
+            r += '}\n'
+        self.nestout('i')
+        if self.checkkeyword(BasKeyword.IF):    # else if が続く場合
+            x = self.expect(self.expr())
+            self.nextkeyword(BasKeyword.THEN)
+            self.nestin('I' if self.checksymbol('{') else 'i')
+            return r + '} else ' + f'if ({x.value}) ' + '{\n'
+        else:                                   # else で終了する場合
+            self.nestin('E' if self.checksymbol('{') else 'e')
+            return r + '} else {\n'
+
+    def stmtblockend(self, s):
+        """if then/else節のブロックの終わり '}'"""
+        r = ''
+        if self.nest[:1] == 'i' or self.nest[:1] == 'e':
+            # ブロック内側のthen/else節が終了する
+            r = '}\n'
+            self.nest = self.nest[1:]
+        if self.nest[:1] == 'E':       # else節が終了する
+            self.nestout('E')
+            return r + '}\n'
+        else:                           # then節が終了する
+            self.nestout('I')
+            if not self.checkkeyword(BasKeyword.ELSE):
+                return r + '}\n'
+            if self.checkkeyword(BasKeyword.IF):
+                x = self.expect(self.expr())
+                self.nextkeyword(BasKeyword.THEN)
+                self.nestin('I' if self.checksymbol('{') else 'i')
+                return r + '} else ' + f'if ({x.value}) ' + '{\n'
+            else:
+                self.nestin('E' if self.checksymbol('{') else 'e')
+                return r + '} else {\n'
+
+    def stmtfor(self, s):
+        """for文"""
+        v = self.expect(self.lvalue(isfor=True))
+        self.nextkeyword(BasKeyword.EQ)
+        f = self.expect(self.expr())
+        self.nextkeyword(BasKeyword.TO)
+        t = self.expect(self.expr())
+        self.nestin('f')
+        return f'for ({v.name} = {f.value}; {v.name} <= {t.value}; {v.name}++) ' + '{\n'
+
+    def stmtnext(self, s):
+        """next文"""
+        self.nestout('f')
+        return '}\n'
+
+    def stmtwhile(self, s):
+        """while文"""
+        x = self.expect(self.expr())
+        self.nestin('w')
+        return f'while ({x.value}) ' + '{\n'
+
+    def stmtendwhile(self, s):
+        """endwhile文"""
+        self.nestout('w')
+        return '}\n'
+
+    def stmtrepeat(self, s):
+        """repeat文"""
+        self.nestin('r')
+        return 'do {\n'
+
+    def stmtuntil(self, s):
+        """until文"""
+        x = self.expect(self.expr())
+        self.nestout('r')
+        return '} ' + f'while (!({x.value}));\n'
+
+    def stmtswitch(self, s):
+        """switch文"""
+        x = self.expect(self.expr())
+        self.nestin('s')
+        return f'switch ({x.value}) ' + '{\n'
+
+    def stmtcase(self, s):
+        """case文"""
+        x = self.expect(self.expr())
+        self.indentcnt -= 1
+        return f'case {x.value}:\n'
 
-            elif s.value == BasKeyword.FUNC:
-                self.t.nocomment = False
-                # 関数の戻り値型を取得する(指定されていなければint型とする)
-                fty = BasVariable.INT
-                if t := self.checkvartype():
-                    fty = t.value
+    def stmtdefault(self, s):
+        """default文"""
+        self.indentcnt -= 1
+        return 'default:\n'
 
-                # 関数名を取得する
-                func = self.nexttype(BasToken.VARIABLE)
+    def stmtendswitch(self, s):
+        """endswitch文"""
+        self.nestout('s')
+        return '}\n'
 
-                # ローカル変数名前空間を初期化する
-                self.nsp.setlocal(func)
+    def stmtgoto(self, s):
+        """goto文"""
+        l = int(self.nexttype(BasToken.INT))
+        if self.bpass == 1:
+            self.label.append(l)
+        return f'goto L{l:06d};\n'
 
-                # 引数を取得する
-                self.nextsymbol('(')
-                if self.checksymbol(')'):
-                    arg = 'void'
-                else:
-                    arg = ''
-                    while True:
-                        # 引数名を取得する
-                        var = self.nexttype(BasToken.VARIABLE)
-                        # 引数の型を取得する(指定されていなければint型とする)
-                        vty = BasVariable.INT
-                        if self.checksymbol(';'):
-                            vty = self.expect(self.checkvartype()).value
-                        # 引数をローカル変数として登録する
-                        va = '[32+1]' if vty == BasVariable.STR else ''
-                        v = self.nsp.new(var, vty, va, funcarg=True)
-                        arg += f'{v.typename()} {var}{va}'
-                        # もう引数がないならループを抜ける
-                        if not self.checksymbol(','):
-                            break
-                        arg += ', '
-                    self.nextsymbol(')')
+    def stmtgosub(self, s):
+        """gosub文"""
+        l = int(self.nexttype(BasToken.INT))
+        if self.bpass == 1:
+            self.subr.append(l)
+        return f'S{l:06d}();\n'
+
+    def stmtfunc(self, s):
+        """func文 (関数定義の開始)"""
+        self.t.nocomment = False
+        # 関数の戻り値型を取得する(指定されていなければint型とする)
+        fty = BasVariable.INT
+        if t := self.checkvartype():
+            fty = t.value
+
+        # 関数名を取得する
+        func = self.nexttype(BasToken.VARIABLE)
+        if self.bpass == 1:
+            self.funclines.append(self.stmtlineno)
 
-                # 関数名はグローバルで登録する
-                v = self.nsp.new(func, fty, arg, func=True, forceglobl=True)
+        # ローカル変数名前空間を初期化する
+        self.nsp.setlocal(func)
 
-                r = self.nestclose()
-                self.nestin('F')
-                r += '\n/***************************/\n'
-                r += f'{v.typename(True)} {func}({arg})\n' + '{\n'
-                if self.bpass != 1:
-                    # 2pass目ならローカル変数定義を出力する
-                    ra = ''
-                    for l in self.nsp.definition(func).splitlines():
-                        r += '\t' + l + '\n'
-                        ra = '\n'
-                    r += ra
-                return r
+        # 引数を取得する
+        self.nextsymbol('(')
+        if self.checksymbol(')'):
+            arg = 'void'
+        else:
+            arg = ''
+            while True:
+                # 引数名を取得する
+                var = self.nexttype(BasToken.VARIABLE)
+                # 引数の型を取得する(指定されていなければint型とする)
+                vty = BasVariable.INT
+                if self.checksymbol(';'):
+                    vty = self.expect(self.checkvartype()).value
+                # 引数をローカル変数として登録する
+                va = '[32+1]' if vty == BasVariable.STR else ''
+                v = self.nsp.new(var, vty, va, funcarg=True)
+                arg += f'{v.typename()} {var}{va}'
+                # もう引数がないならループを抜ける
+                if not self.checksymbol(','):
+                    break
+                arg += ', '
+            self.nextsymbol(')')
+
+        # 関数名はグローバルで登録する
+        v = self.nsp.new(func, fty, arg, func=True, forceglobl=True)
+
+        r = self.nestclose()
+        self.nestin('F')
+        r += '\n/***************************/\n'
+        r += f'{v.typename(True)} {func}({arg})\n' + '{\n'
+        if self.bpass != 1:
+            # 2pass目ならローカル変数定義を出力する
+            ra = ''
+            for l in self.nsp.definition(func).splitlines():
+                r += '\t' + l + '\n'
+                ra = '\n'
+            r += ra
+        return r
 
-            elif s.value == BasKeyword.ENDFUNC:
-                self.nsp.setlocal(None)
-                self.nestout('F')
+    def stmtendfunc(self, s):
+        """endfunc文"""
+        self.nsp.setlocal(None)
+        self.nestout('F')
+        self.t.nocomment = True
+        return '}\n'
+
+    def stmtreturn(self, s):
+        """return文"""
+        if self.checksymbol('('):
+            r = self.expr()
+            if r and not (self.flag & Bas2C.BCCOMPAT):
+                if v:= self.nsp.find(r.value, localonly=True):
+                    self.expect(not (v.type == BasVariable.STR and not v.funcarg), \
+                            f'str 型のローカル変数 {v.name} は関数の戻り値にはできません')
+            self.nextsymbol(')')
+            if r:
+                return f'return {r.value};\n'
+            else:
+                return 'return 0;\n'
+        else:
+            r = ''
+            if self.nest == 'S':            # サブルーチンを閉じる
+                self.nestout('S')
                 self.t.nocomment = True
-                return '}\n'
+                r = '}\n'
+            return 'return;\n' + r
 
-            elif s.value == BasKeyword.RETURN:
-                if self.checksymbol('('):
-                    r = self.expr()
-                    if r and not (self.flag & Bas2C.BCCOMPAT):
-                        if v:= self.nsp.find(r.value, localonly=True):
-                            self.expect(not (v.type == BasVariable.STR and not v.funcarg), \
-                                    f'str 型のローカル変数 {v.name} は関数の戻り値にはできません')
-                    self.nextsymbol(')')
-                    if r:
-                        return f'return {r.value};\n'
-                    else:
-                        return 'return 0;\n'
-                else:
-                    r = ''
-                    if self.nest == 'S':            # サブルーチンを閉じる
-                        self.nestout('S')
-                        self.t.nocomment = True
-                        r = '}\n'
-                    return 'return;\n' + r
-
-            elif s.value == BasKeyword.BREAK:
-                self.checksymbol(';')
-                return 'break;\n'
-
-            elif s.value == BasKeyword.CONTINUE:
-                return 'continue;\n'
-
-            elif s.value == BasKeyword.LOCATE:
-                r = ''
-                x = self.expr()
-                if x != None:
-                    self.nextsymbol(',')
-                    y = self.expect(self.expr())
-                    r = f'locate({x.value},{y.value});\n'
-                else:
-                    self.nextsymbol(',')
-                if self.checksymbol(','):
-                    a = self.expect(self.expr())
-                    r += f'b_csw({a.value});\n'
-                return r
-
-            elif s.value == BasKeyword.ERROR:
-                x = self.t.fetch()                  # error命令は読み飛ばして無視
-                return f'/* error {x.value} */\n'
+    def stmtbreak(self, s):
+        """break文"""
+        self.checksymbol(';')
+        return 'break;\n'
 
-            elif s.value == BasKeyword.END:
-                r = ''
-                if self.nest == 'M':                # main関数を閉じる
-                    self.nestout('M')
-                    self.t.nocomment = True
-                    r = '}\n'
-                return self.b_exit + '(0);\n' + r
+    def stmtcontinue(self, s):
+        """continue文"""
+        return 'continue;\n'
 
-            elif r := self.exfncall(s.value):
-                return r.value + ';\n'
-            else:
-                self.expect(None)
+    def stmtlocate(self, s):
+        """locate文"""
+        r = ''
+        x = self.expr()
+        if x != None:
+            self.nextsymbol(',')
+            y = self.expect(self.expr())
+            r = f'locate({x.value},{y.value});\n'
+        else:
+            self.nextsymbol(',')
+        if self.checksymbol(','):
+            a = self.expect(self.expr())
+            r += f'b_csw({a.value});\n'
+        return r
 
-        elif s := self.checktype(BasToken.SYMBOL):
-            if s.value == '}':                  # if then/else節が終了する場合
-                r = ''
-                if self.nest[0] == 'i' or self.nest[0] == 'e':
-                    # ブロック内側のthen/else節が終了する
-                    r = '}\n'
-                    self.nest = self.nest[1:]
-                if self.nest[0] == 'E':         # else節が終了する
-                    self.nestout('E')
-                    return r + '}\n'
-                else:                           # then節が終了する
-                    self.nestout('I')
-                    if not self.checkkeyword(BasKeyword.ELSE):
-                        return r + '}\n'
-                    if self.checkkeyword(BasKeyword.IF):
-                        x = self.expect(self.expr())
-                        self.nextkeyword(BasKeyword.THEN)
-                        self.nestin('I' if self.checksymbol('{') else 'i')
-                        return r + '} else ' + f'if ({x.value}) ' + '{\n'
-                    else:
-                        self.nestin('E' if self.checksymbol('{') else 'e')
-                        return r + '} else {\n'
+    def stmterror(self, s):
+        """error文"""
+        x = self.t.fetch()                  # error命令は読み飛ばして無視
+        return f'/* error {x.value} */\n'
 
-        elif s := self.checktype(BasToken.COMMENT):
-            return s.value
+    def stmtend(self, s):
+        """end文"""
+        r = ''
+        if self.nest == 'M':                # main関数を閉じる
+            self.nestout('M')
+            self.t.nocomment = True
+            r = '}\n'
+        return self.b_exit + '(0);\n' + r
 
-        else:
-            r = self.t.fetch()
-            if s := self.lvalue(r, islet=True):             # 左辺値
-                self.nextkeyword(BasKeyword.EQ)
-                x = self.initvar(s.type)                    # 代入する値を得る
-                if s.type >= BasVariable.DIM:               # 配列なら一時変数の内容をコピー
-                    v = self.nsp.find(s.name)
-                    # 一時変数を名前空間に登録する
-                    self.nsp.new(f'_initmp{self.initmp:04d}', v.type + BasVariable.STATICCONST, v.arg, x)
-                    r = f'memcpy({s.name}, _initmp{self.initmp:04d}, sizeof({s.name}));\n'
-                    self.initmp += 1
+    def stmtlet(self, r):
+        """代入文または関数呼び出し"""
+        if s := self.lvalue(r, islet=True):             # 左辺値
+            self.nextkeyword(BasKeyword.EQ)
+            if s.type == BasVariable.STR and (self.flag & Bas2C.STRAPPEND):
+                x = self.expect(self.expr())
+                if r := self.strappend(s, x):           # a$ = a$ + .. ならバッファに追加
                     return r
-                if s.type == BasVariable.STR:               # 文字列ならb_strncpy()
-                    return f'b_strncpy(sizeof({s.name}),{s.name},{x});\n'
-                else:                                       # 単純変数への代入
-                    return f'{s.name} = {x};\n'
-            else:
-                s = self.expect(self.fncall(r))             # 関数呼び出し
-                return s.value + ';\n'
-
-        self.expect(None)
+                return f'b_strncpy(sizeof({s.name}),{s.name},{x.value});\n'
+            if s.type == BasVariable.INT or s.type == BasVariable.CHAR:
+                return f'{s.name} = {self.intassign(s, self.expect(self.expr()))};\n'
+            x = self.initvar(s.type)                    # 代入する値を得る
+            if s.type >= BasVariable.DIM:               # 配列なら一時変数の内容をコピー
+                v = self.nsp.find(s.name)
+                # 同じ関数内に同じ型と内容の一時変数があればそれを使う
+                key = None
+                if (self.flag & Bas2C.PEEPHOLE) and self.incremental == None:
+                    import hashlib
+                    key = hashlib.sha1(repr([self.curlocalname(), v.type, v.arg,
+                                             re.sub(r'\s+', '', x)]).encode()).hexdigest()
+                    if key in self.initmps:
+                        return f'memcpy({s.name}, {self.initmps[key]}, sizeof({s.name}));\n'
+                # 一時変数を名前空間に登録する
+                self.nsp.new(f'_initmp{self.initmp:04d}', v.type + BasVariable.STATICCONST, v.arg, x)
+                r = f'memcpy({s.name}, _initmp{self.initmp:04d}, sizeof({s.name}));\n'
+                if key:
+                    self.initmps[key] = f'_initmp{self.initmp:04d}'
+                self.initmp += 1
+                return r
+            if s.type == BasVariable.STR:               # 文字列ならb_strncpy()
+                return f'b_strncpy(sizeof({s.name}),{s.name},{x});\n'
+            else:                                       # 単純変数への代入
+                return f'{s.name} = {x};\n'
+        else:
+            s = self.expect(self.fncall(r))             # 関数呼び出し
+            return s.value + ';\n'
 
 ##############################################################################
 
@@ -1185,27 +1676,62 @@ class Bas2C:
         """変数/配列の初期値を得る"""
         if ty >= BasVariable.DIM:
             self.nextsymbol('{')            # 配列の場合
-            n = '{'
+            n = ['{']
+            col = 1                         # 出力中の行の長さ
             nest = 1
             while nest > 0:
-                if self.checksymbol('{'):
-                    n += '{'
+                if a := self.t.fetchint():     # 整数定数だけの要素は式の解析を省く
+                    pass
+                elif self.checksymbol('{'):
+                    a = '{'
                     nest += 1
                 elif self.checksymbol('}'):
-                    n += '}'
+                    a = '}'
                     nest -= 1
                 elif a := self.checktype(BasToken.SYMBOL):
-                    n += a.value
+                    a = a.value
+                    # 長い行は要素の区切りで折り返す
+                    if a == ',' and col >= 1000:
+                        a = ',\n'
                 elif a := self.checkkeyword(BasKeyword.EOL):
-                    n += '\n'
+                    a = '\n'
                 elif a := self.checktype(BasToken.COMMENT):
-                    n += a.value
+                    a = a.value
                 else:
-                    n += self.expect(self.expr()).value
-            return n
+                    a = self.expect(self.expr()).value
+                n.append(a)
+                col = len(a) - a.rindex('\n') - 1 if '\n' in a else col + len(a)
+            return ''.join(n)
         else:
             return self.expect(self.expr()).value
 
+    def strappend(self, s, x):
+        """s = s + .. の代入を文字列バッファへの追加に変換する"""
+        ops = getattr(x, 'strcat', None)
+        if not ops or ops[0] != s.name:
+            return None
+        # 追加する文字列が代入先の変数を参照していたり、
+        # ユーザ定義関数を呼び出していたら変換しない
+        var = re.match(r'\w+', s.name).group(0)
+        cfunc = { (ex.cfunc if ex.cfunc else ex.name) for ex in BasKeyword.exfnlist.values() }
+        for a in ops[1:]:
+            if re.search(rf'\b{var}\b', a):
+                return None
+            for f in re.findall(r'(\w+)\s*\(', a):
+                if self.nsp.find(f) or not (f in cfunc or f in ('b_stradd', 'b_strfS', 'fabs', 'sizeof')):
+                    return None
+        self.extdef['_strapp'] = \
+            '\nstatic void _strapp(int size, unsigned char *d, unsigned char *s)\n{\n' \
+            '\tint l = strlen(d);\n' \
+            '\tif (size > 256)\n\t\tsize = 256;\n' \
+            '\tif (l > size - 1)\n\t\tl = size - 1;\n' \
+            '\twhile (*s && l < size - 1)\n\t\td[l++] = *s++;\n' \
+            '\td[l] = \'\\0\';\n}\n'
+        r = ''
+        for a in ops[1:]:
+            r += f'_strapp(sizeof({s.name}),{s.name},{a});\n'
+        return r
+
     def fncall(self, var):
         """関数呼び出しを生成する"""
         if not var.istype(BasToken.VARIABLE):
@@ -1402,7 +1928,16 @@ class Bas2C:
                     v = f'b_strcmp({r.value},0x{map[p.value][1]:x},{a.value})'
                     if not (self.flag & Bas2C.BCCOMPAT):
                         v = f'(({v})?-1:0)'
+                        if self.flag & Bas2C.STRCMP and (c := self.strcmpspec(r, map[p.value][0], a)):
+                            v = f'-({c})'
                 else:
+                    if (r.type == BasToken.FLOAT or a.type == BasToken.FLOAT) and (self.flag & Bas2C.INTARITH):
+                        # 整数値同士の比較は整数で行う (値がint型の範囲に収まることが分かる場合のみ)
+                        br, ba = self.intbound(r), self.intbound(a)
+                        if (ir := self.intvalue(r)) != None and (ia := self.intvalue(a)) != None and \
+                           br != None and ba != None and max(br, ba) < 0x80000000:
+                            r = BasToken.int(ir)
+                            a = BasToken.int(ia)
                     v = f'{r.value} {map[p.value][0]} {a.value}'
                     if not (self.flag & Bas2C.BCCOMPAT):
                         v = f'-({v})'
@@ -1420,6 +1955,11 @@ class Bas2C:
                     v = f'((int){r.value} {map[p.value]} (int){a.value})'
                 else:
                     v = f'{r.value} {map[p.value]} {a.value}'
+                if self.flag & Bas2C.ARITH:
+                    if self.constvalue(a) == 0:             # 0ビットのシフトは不要
+                        v = self.intoperand(r)[0]
+                    elif self.constvalue(r) == 0 and self.intoperand(a)[1]:
+                        v = '0'                             # 0はシフトしても0
                 r = BasToken.int(v)
             return r
 
@@ -1429,15 +1969,19 @@ class Bas2C:
             if r.istype(BasToken.STR):        # 文字列の連結
                 if not self.checkkeyword(BasKeyword.PLUS):
                     return r
+                ops = [r.value]             # 連結する文字列 (バッファへの追加に使う)
                 r = BasToken.str(f'b_stradd(strtmp{self.strtmp},{r.value},')
                 self.strtmp += 1
                 while True:
                     a = self.expect(mod(self))
                     self.expect(a.istype(BasToken.STR))
                     r = BasToken.str(f'{r.value}{a.value},')
+                    ops.append(a.value)
                     if not self.checkkeyword(BasKeyword.PLUS):
                         break
-                return BasToken.str(f'{r.value}-1)')
+                r = BasToken.str(f'{r.value}-1)')
+                r.strcat = ops
+                return r
             else:
                 map = {BasKeyword.PLUS: '+', BasKeyword.MINUS: '-'}
                 while p := checkops(self, map):
@@ -1446,7 +1990,14 @@ class Bas2C:
                     v = f'{r.value} {map[p.value]} {a.value}'
                     if not (self.flag & Bas2C.BCCOMPAT):
                         v = f'({v})'
-                    r = BasToken(rty, v)
+                    if rty == BasToken.FLOAT and (self.flag & Bas2C.INTARITH):
+                        iv = self.intop(r, map[p.value], a)
+                        br, ba = self.intbound(r), self.intbound(a)
+                        r = BasToken(rty, v)
+                        r.ival = iv
+                        r.ibound = br + ba if br != None and ba != None else None
+                    else:
+                        r = BasToken(rty, v)
                 return r
 
         def mod(self):
@@ -1459,7 +2010,17 @@ class Bas2C:
                     v = f'((int){r.value} % (int){a.value})'
                 else:
                     v = f'{r.value} % {a.value}'
+                nonneg = False
+                if (k := self.pow2(a)) != None and r.type != BasToken.FLOAT:
+                    x, simple = self.intoperand(r)
+                    m = (1 << k) - 1
+                    if self.nonneg(r):
+                        v = f'({x} & {m})'
+                        nonneg = True
+                    elif simple:                # 負の数の剰余は符号を被除数に合わせる
+                        v = f'({x} - (({x} < 0 ? {x} + {m} : {x}) & ~{m}))'
                 r = BasToken.int(v)
+                r.nonneg = nonneg
             return r
 
         def yen(self):
@@ -1472,7 +2033,17 @@ class Bas2C:
                     v = f'((int){r.value} / (int){a.value})'
                 else:
                     v = f'{r.value} / {a.value}'
+                nonneg = False
+                if (k := self.pow2(a)) != None and \
+                   (r.type != BasToken.FLOAT or not (self.flag & Bas2C.BCCOMPAT)):
+                    x, simple = self.intoperand(r)
+                    if self.nonneg(r):
+                        v = f'({x} >> {k})'
+                        nonneg = True
+                    elif simple:                # 負の数は0方向に切り捨てる
+                        v = f'(({x} < 0 ? {x} + {(1 << k) - 1} : {x}) >> {k})'
                 r = BasToken.int(v)
+                r.nonneg = nonneg
             return r
 
         def muldiv(self):
@@ -1485,7 +2056,20 @@ class Bas2C:
                 v = f'{r.value} {map[p.value]} {a.value}'
                 if not (self.flag & Bas2C.BCCOMPAT):
                     v = f'({v})'
-                r = BasToken(rty, v)
+                if rty == BasToken.INT and p.value == BasKeyword.MUL:
+                    if (k := self.pow2(a)) != None:
+                        v = f'({self.intoperand(r)[0]} << {k})'
+                    elif (k := self.pow2(r)) != None:
+                        v = f'({self.intoperand(a)[0]} << {k})'
+                # 除算は整数にすると結果が変わるので乗算のみ
+                if rty == BasToken.FLOAT and p.value == BasKeyword.MUL and (self.flag & Bas2C.INTARITH):
+                    iv = self.intop(r, '*', a)
+                    br, ba = self.intbound(r), self.intbound(a)
+                    r = BasToken(rty, v)
+                    r.ival = iv
+                    r.ibound = br * ba if br != None and ba != None else None
+                else:
+                    r = BasToken(rty, v)
             return r
 
         def posneg(self):
@@ -1493,19 +2077,32 @@ class Bas2C:
             if p := checkops(self, map):
                 r = self.expect(posneg(self))
                 rty = self.expect(r.resulttype())
-                return BasToken(rty, map[p.value] + r.value)
+                x = BasToken(rty, map[p.value] + r.value)
+                if rty == BasToken.FLOAT and (iv := self.intvalue(r)) != None:
+                    x.ival = map[p.value] + iv
+                    x.ibound = self.intbound(r)
+                return x
             return paren(self)
 
         def paren(self):
             if self.checksymbol('('):
                 r = self.expect(self.expr())
                 self.nextsymbol(')')
-                return BasToken(r.type, f'({r.value})')
+                x = BasToken(r.type, f'({r.value})')
+                if r.type == BasToken.FLOAT and (iv := self.intvalue(r)) != None:
+                    x.ival = f'({iv})'
+                    x.ibound = self.intbound(r)
+                return x
             return atom(self)
 
         def atom(self):
             r = self.t.fetch()
             if r.isconst():                             # 定数
+                if r.type == BasToken.FLOAT and (self.flag & Bas2C.INTARITH):
+                    # 値が整数の実数定数は整数演算に使える
+                    f = self.constvalue(r)
+                    if f != None and f == int(f) and abs(f) < 0x40000000:
+                        r.ival = str(int(f))
                 return r
             elif r.istype(BasToken.KEYWORD):
                 if v := self.exfncall(r.value, True):   # 組込関数/外部関数
@@ -1521,7 +2118,152 @@ class Bas2C:
 
 ##############################################################################
 
+    def incrinit(self):
+        """インクリメンタル変換の準備を行う (前回の変換結果を読み込み、領域の開始行を求める)"""
+        import json
+        import hashlib
+        # 変換条件が前回と異なる場合は前回の変換結果を使わない
+        try:
+            with open(__file__, 'rb') as f:
+                src = hashlib.sha1(f.read()).hexdigest()
+        except:
+            src = ''
+        exfn = [[e.type, e.name, e.arg, e.cfunc, e.carg, e.group] for e in BasKeyword.exfnlist.values()]
+        flag = self.flag & ~(Bas2C.REPORT | Bas2C.VERBOSE)     # 変換結果に影響しないものは除く
+        self.incrversion = hashlib.sha1(json.dumps([flag, self.cindent, self.inlinesize,
+                                                    exfn, src]).encode()).hexdigest()
+        self.incrcache = {}
+        try:
+            if isinstance(self.incremental, dict):      # 変換結果をメモリ上に保持する場合
+                d = self.incremental
+            else:
+                with open(self.incremental, 'r') as f:
+                    d = json.load(f)
+            if d.get('version') == self.incrversion:
+                self.incrcache = d['regions']
+        except:
+            pass
+        self.incrnew = {}
+        self.incrcur = None
+
+        # func文とGOSUB飛び先の行で領域を区切る (直前の #c～#endc は領域に含める)
+        src = self.t.srclines
+        starts = set([1])
+        for n in self.funclines + [self.linemap[l] for l in self.subr if l in self.linemap]:
+            i = n - 2
+            if i >= 0 and src[i].startswith('#endc'):
+                while i >= 0 and not src[i].startswith('#c'):
+                    i -= 1
+                n = i + 1 if i >= 0 else n
+            starts.add(n)
+        self.incrstarts = sorted(starts)
+        self.incrstartset = starts
+        self.incrlabel = set(self.label)
+        self.incrsubr = set(self.subr)
+
+    def incrkey(self, a, e):
+        """領域 [a, e) のソースコードと参照するシンボル、変換開始時の状態からハッシュ値を得る"""
+        import json
+        import hashlib
+        text = ''.join(self.t.srclines[a - 1:e - 1])
+        deps = []
+        for n in sorted(set(re.findall(r'[a-zA-Z_][a-zA-Z0-9_$]*', text))):
+            n = n.replace('$','S')
+            if n in self.nsp.glist:
+                deps.append([n, repr(self.nsp.glist[n])])
+            if n in self.nsp.llist:
+                deps.append([n, [repr(v) for v in self.nsp.llist[n].values()]])
+        # 領域内の行がGOTO/GOSUBの飛び先かどうかも変換結果に影響する
+        for l, n in sorted(self.linemap.items()):
+            if a <= n < e:
+                deps.append([l, l in self.incrlabel, l in self.incrsubr])
+        state = [self.nest, self.curlocalname(), self.t.nocomment, self.initmp]
+        return hashlib.sha1(json.dumps([text, deps, state]).encode()).hexdigest()
+
+    def curlocalname(self):
+        """現在のローカル名前空間の関数名を得る"""
+        for k, v in self.nsp.llist.items():
+            if v is self.nsp.curlocal:
+                return k
+        return None
+
+    def incrbegin(self, code):
+        """領域の先頭なら前回の変換結果を再利用するか、変換結果の記録を開始する"""
+        if self.t.line != '' or self.t.cached:
+            return False
+        a = self.t.lineno + 1
+        if a not in self.incrstartset:
+            return False
+        self.incrend(code)
+        i = self.incrstarts.index(a)
+        e = self.incrstarts[i + 1] if i + 1 < len(self.incrstarts) else len(self.t.srclines) + 1
+        key = self.incrkey(a, e)
+
+        if r := self.incrcache.get(key):
+            # 前回の変換結果をそのまま使って、領域の最後まで読み飛ばす
+            for kind, text, indent, lineno in r['code']:
+                code.append(BasCLine(kind, text, indent, lineno + a - 1 if lineno else 0))
+            self.exfngroup |= set(r['groups'])
+            for k, v in r['extdef']:
+                self.extdef.setdefault(k, v)
+            self.strtmp_max = max(self.strtmp_max, r['strtmp'])
+            self.nest, local, self.t.nocomment, self.initmp = r['end']
+            self.nsp.setlocal(local)
+            self.t.skipto(e - 1)
+            self.incrnew[key] = r
+            self.report(f'{e - a} 行を前回の変換結果から再利用しました', a)
+            return True
+
+        # 領域の変換結果の記録を開始する
+        self.updatestrtmp()
+        self.incrcur = [key, a, e, len(code), self.errcount, self.exfngroup, self.extdef, self.strtmp_max]
+        self.exfngroup = set()
+        self.extdef = {}
+        self.strtmp_max = 0
+        return False
+
+    def incrend(self, code):
+        """記録中の領域の変換結果を保存する"""
+        if not self.incrcur:
+            return
+        key, a, e, pos, errcount, exfngroup, extdef, strtmp_max = self.incrcur
+        self.incrcur = None
+        self.updatestrtmp()
+        r = { 'groups': sorted(self.exfngroup),
+              'extdef': list(self.extdef.items()),
+              'strtmp': self.strtmp_max }
+        self.exfngroup |= exfngroup
+        for k, v in r['extdef']:
+            extdef.setdefault(k, v)
+        self.extdef = extdef
+        self.strtmp_max = max(self.strtmp_max, strtmp_max)
+
+        # エラーのあった領域や、想定した位置で終わらなかった領域は保存しない
+        if self.errcount != errcount or self.t.lineno + 1 != e:
+            return
+        r['code'] = [[c.kind, c.text, c.indent, c.lineno - a + 1 if c.lineno else 0] for c in code[pos:]]
+        r['end'] = [self.nest, self.curlocalname(), self.t.nocomment, self.initmp]
+        self.incrnew[key] = r
+
+    def incrsave(self):
+        """今回の変換で使った領域の変換結果を保存する"""
+        import json
+        d = { 'version': self.incrversion, 'regions': self.incrnew }
+        if isinstance(self.incremental, dict):
+            self.incremental.clear()
+            self.incremental.update(d)
+            return
+        try:
+            with open(self.incremental, 'w') as f:
+                json.dump(d, f)
+        except:
+            print(f'{self.finame:s}: cannot write {self.incremental}')
+
     def start(self, fo=sys.stdout, finame='<stdin>'):
+        self.finame = finame
+        self.starttime = clock()
+        if self.incremental != None:
+            self.t.srclines = []
         self.setpass(1)     # pass 1
         while True:
             try:
@@ -1529,56 +2271,1255 @@ class Bas2C:
                     break
             except BasException1 as e:
                 self.error(e, finame)
+                if self.toomanyerrors():
+                    break
             except BasException2:
                 self.t.skip()
+        if self.toomanyerrors() or (self.errcount and self.flag & Bas2C.PASS1STOP):
+            return self.exitstatus
 
         self.setpass(2)     # pass 2
-        fo.write('#include <basic0.h>\n')
-        fo.write('#include <string.h>\n')
-        if self.flag & Bas2C.NOBINIT:
-            fo.write('#include <stdlib.h>\n')
-        for e in self.exfngroup:
-            if e:
-                fo.write(f'#include <{e.lower()}.h>\n')
-        fo.write('\n' + self.gendefine())
-        for _ in range(self.strtmp_max):
-            fo.write(f'static unsigned char strtmp{_}[258];\n')
-        fo.write('\n/******** program start ********/\n')
-        fo.write('void main(int b_argc, char *b_argv[])\n{\n')
-        if not self.flag & Bas2C.NOBINIT:
-            fo.write('\tb_init();\n')
+        code = []
+        if self.incremental != None:
+            self.incrinit()
         while True:
             try:
                 self.indentinit()
+                if self.incremental != None and self.incrbegin(code):
+                    continue
                 s = self.statement()
-                fo.write(self.t.getccode())
-                fo.write(self.genlabel())
+                for l in self.t.getccode().splitlines(True):
+                    code.append(BasCLine(BasCLine.CCODE, l))
+                for l in self.genlabel().splitlines(True):
+                    code.append(BasCLine(BasCLine.LABEL, l))
                 if s == None:
                     break
-                if s:
-                    for l in s.splitlines():
-                        fo.write(self.indentout() + l + '\n')
+                for l in s.splitlines():
+                    code.append(BasCLine(BasCLine.STMT, l, self.indentcnt, self.stmtlineno))
             except BasException1:
                 pass
             except BasException2 as e:
                 self.error(e, finame)
+                if self.toomanyerrors():
+                    return self.exitstatus
                 self.t.skip()
+        if self.incremental != None:
+            self.incrend(code)
+            self.incrsave()
         try:
-            fo.write(self.nestclose())
+            for l in self.nestclose().splitlines(True):
+                code.append(BasCLine(BasCLine.CCODE, l))
         except BasException2 as e:
             self.error(e, finame)
 
+        code = self.optimize(code)
+
+        if self.split and self.splitoutput(fo, code):
+            return self.exitstatus
+        fo.write(self.genincludes())
+        fo.write('\n' + self.gendefine())
+        for _ in range(self.strtmp_max):
+            fo.write(f'static unsigned char strtmp{_}[258];\n')
+        for d in self.extdef.values():
+            fo.write(d)
+        fo.write('\n/******** program start ********/\n')
+        fo.write('void main(int b_argc, char *b_argv[])\n{\n')
+        if not self.flag & Bas2C.NOBINIT:
+            fo.write('\tb_init();\n')
+        for c in code:
+            fo.write(c.output())
+
         return self.exitstatus
 
+    def genincludes(self):
+        """ヘッダファイルの #include を出力する"""
+        r = '#include <basic0.h>\n'
+        r += '#include <string.h>\n'
+        if self.flag & Bas2C.NOBINIT:
+            r += '#include <stdlib.h>\n'
+        if self.flag & Bas2C.PROFILE:
+            r += '#include <stdio.h>\n'
+        for h in self.includes():
+            r += f'#include <{h}>\n'
+        return r
+
+    def splitoutput(self, fo, code):
+        """main関数、func の関数、サブルーチンをそれぞれ別のファイルに出力する (分割できなければFalse)"""
+        import os
+        def cannot(msg):
+            print(f'{self.finame:s}\t: warning: {msg}ため、1つのファイルに出力します')
+            return False
+
+        if self.flag & Bas2C.PROFILE:
+            return cannot('実行回数のカウンタを使う')
+        regions = self.cfunctions(code)
+        inside = [False] * len(code)
+        for _, s, e in regions:
+            inside[s:e] = [True] * (e - s)
+        if [c for i, c in enumerate(code) if not inside[i] and c.text.strip()]:
+            return cannot('関数の外にインラインCのコードがある')
+        for name, s, e in regions:
+            labels = { c.text.strip()[:-1] for c in code[s:e] if c.kind == BasCLine.LABEL }
+            for c in code[s:e]:
+                if c.kind == BasCLine.STMT and \
+                   (m := re.search(r'\bgoto (L\d+);', c.text)) and m.group(1) not in labels:
+                    return cannot(f'関数 {name} の外への GOTO ({m.group(1)}) がある')
+
+        # func の関数は1つずつ、続いているサブルーチンはある程度の大きさまでまとめて1つのファイルにする
+        groups = [[regions[0]]]
+        for r in regions[1:]:
+            if len(groups) > 1 and re.fullmatch(r'S\d{6}', r[0]) and re.fullmatch(r'S\d{6}', groups[-1][0][0]) and \
+               sum(e - s for _, s, e in groups[-1]) < 200:
+                groups[-1].append(r)
+            else:
+                groups.append([r])
+
+        # グローバル変数は main関数のファイルで定義し、ヘッダファイルで extern 宣言する
+        hname = os.path.basename(self.split) + '.h'
+        h = self.genincludes() + '\n'
+        d = f'#include "{hname}"\n\n'
+        for v in self.nsp.glist.values():
+            if v.funcarg:
+                continue
+            if v.func:
+                h += v.definition()
+                continue
+            ty = v.typename(globl=True).replace('static ', '')
+            h += f'extern {ty} {v.name}{v.arg};\n'
+            d += f'{ty} {v.name}{v.arg}' + (f' = {v.init}' if v.init else '') + ';\n'
+        for l in sorted(set(self.subr)):
+            h += f'void S{l:06d}(void);\n'
+        for _ in range(self.strtmp_max):
+            h += f'extern unsigned char strtmp{_}[258];\n'
+            d += f'unsigned char strtmp{_}[258];\n'
+        for x in self.extdef.values():
+            if m := re.match(r'static ([^(=]*?)\s*(\w+)\[\w*\] =', x):
+                h += f'extern {m.group(1)} {m.group(2)}[];\n'
+                d += x[len('static '):]
+            else:
+                h += x                  # 関数はファイルごとに static で定義する
+
+        encoding = getattr(fo, 'encoding', None) or 'utf-8'
+        files = [(self.split + '.h', h)]
+        for g in groups[1:]:
+            files.append((f'{self.split}_{g[0][0]}.c',
+                          f'#include "{hname}"\n' + ''.join(c.output() for _, s, e in g for c in code[s:e])))
+        for f, text in files:
+            with open(f, 'w', encoding=encoding) as fh:
+                fh.write(text)
+            self.outfiles.append(f)
+            self.report(f'{f} を出力しました')
+
+        fo.write(d)
+        fo.write('\n/******** program start ********/\n')
+        fo.write('void main(int b_argc, char *b_argv[])\n{\n')
+        if not self.flag & Bas2C.NOBINIT:
+            fo.write('\tb_init();\n')
+        for c in code[regions[0][1]:regions[0][2]]:
+            fo.write(c.output())
+        return True
+
+    def includes(self):
+        """使われた関数グループのヘッダファイル名のリストを得る (実行ごとに順序が変わらないようにソートする)"""
+        return sorted(f'{e.lower()}.h' for e in self.exfngroup if e)
+
+    def optimize(self, code):
+        """pass 2で得られたCソースコードに最適化を行う"""
+        if self.flag & Bas2C.INLINE:
+            code = self.inline(code)
+        if self.flag & Bas2C.DEADCODE:
+            code = self.deadcode(code)
+        if self.flag & Bas2C.STRUCTURE:
+            code = self.structure(code)
+        if self.flag & Bas2C.LICM:
+            code = self.licm(code)
+        if self.flag & Bas2C.CSE:
+            code = self.cse(code)
+        if self.flag & Bas2C.ROWBASE:
+            code = self.rowbase(code)
+        if self.flag & Bas2C.PEEPHOLE:
+            code = self.peephole(code)
+        if self.flag & Bas2C.PROFILE:
+            code = self.profile(code)
+        return code
+
+    def report(self, msg, lineno=None):
+        """最適化の内容を表示する"""
+        if self.flag & Bas2C.REPORT:
+            self.diagout('info', msg, **({ 'line': lineno } if lineno else {}))
+            lineno = f':{lineno}' if lineno else ''
+            print(f'{self.finame:s}{lineno}\t: info: {msg}')
+
+    def diagout(self, level, msg=None, **kw):
+        """エラー情報などをJSON形式で1行ずつ出力する"""
+        if not self.diag:
+            return
+        import json
+        r = { 'file': self.finame, 'level': level }
+        if msg != None:
+            r['message'] = msg
+        r.update(kw)
+        r['time'] = round(clock() - self.starttime, 6)
+        self.diag.write(json.dumps(r, ensure_ascii=False) + '\n')
+        self.diag.flush()
+
+    def cfunctions(self, code):
+        """Cソースコード中の関数の名前と範囲 [名前, 開始行, 終了行の次] のリストを得る"""
+        r = [['main', 0, len(code)]]
+        depth = 1
+        for i, c in enumerate(code):
+            l = c.text.strip()
+            if l.startswith('}'):
+                depth -= 1
+                if depth == 0:
+                    r[-1][2] = i + 1
+            elif depth == 0 and i + 1 < len(code) and code[i + 1].text.strip() == '{' and \
+                 (m := re.fullmatch(r'[\w\s*]*?\b(\w+)\(.*\)', l)):
+                # 関数の前にある空行と区切りのコメントも関数の範囲に含める
+                j = i
+                while j > r[-1][2] and code[j - 1].text.strip() in ('', '/***************************/'):
+                    j -= 1
+                r.append([m.group(1), j, len(code)])
+            if l.endswith('{'):
+                depth += 1
+        return r
+
+    def splitargs(self, s):
+        """関数の引数をカンマで分割する"""
+        r = []
+        depth = 0
+        a = ''
+        for t in re.findall(r'"(?:\\.|[^"\\])*"|\'(?:\\.|[^\'\\])*\'|.', s):
+            if t in '([':
+                depth += 1
+            elif t in ')]':
+                depth -= 1
+            elif t == ',' and depth == 0:
+                r.append(a.strip())
+                a = ''
+                continue
+            a += t
+        return r + [a.strip()] if a.strip() else r
+
+    def inline(self, code):
+        """小さな関数やサブルーチンの本体を呼び出し箇所に展開する"""
+        def rename(text, names, pre):
+            """文字列定数と文字定数以外にある変数名に接頭辞を付ける"""
+            if not names:
+                return text
+            parts = re.split(r'("(?:\\.|[^"\\])*"|\'(?:\\.|[^\'\\])*\')', text)
+            for k in range(0, len(parts), 2):
+                parts[k] = re.sub(r'\b(' + '|'.join(names) + r')\b', rf'{pre}\1', parts[k])
+            return ''.join(parts)
+
+        # 自分自身を(間接的に)呼び出す関数は展開しない
+        funcs = self.cfunctions(code)
+        calls = {}
+        for f in funcs:
+            h = f[1]
+            while f[0] != 'main' and code[h].text.strip() != '{':
+                h += 1
+            calls[f[0]] = set(re.findall(r'\b(\w+)\s*\(', ''.join(c.text for c in code[h:f[2]])))
+        def recursive(name):
+            done = set()
+            left = [g for g in calls[name] if g in calls]
+            while left:
+                f = left.pop()
+                if f == name:
+                    return True
+                if f not in done:
+                    done.add(f)
+                    left += [g for g in calls[f] if g in calls]
+            return False
+
+        # 展開できる関数の本体を取り出す
+        body = {}
+        for name, a, b in funcs[1:]:
+            h = a
+            while code[h].text.strip() != '{':
+                h += 1
+            lines = [c for c in code[h + 1:b - 1]
+                     if not (c.kind == BasCLine.CCODE and re.fullmatch(r'\s*/\*===.*===\*/\s*', c.text))]
+            if code[b - 1].text.strip() != '}' or recursive(name) or \
+               [c for c in lines if c.kind != BasCLine.STMT]:
+                continue
+            decl = []
+            args = []
+            ret = None
+            v = self.nsp.glist.get(name, None)
+            if v and v.func:
+                # 関数ならローカル変数定義と引数、戻り値の式を得る
+                if name not in self.nsp.llist or v.type == BasVariable.STR:
+                    continue
+                while lines and lines[0].text.startswith('\t'):
+                    decl.append(lines.pop(0).text.strip())
+                if decl:
+                    if not lines or lines[0].text != '':
+                        continue
+                    lines.pop(0)
+                if [d for d in decl if d.startswith('static')]:
+                    continue
+                args = [l for l in self.nsp.llist[name].values() if l.funcarg]
+                if lines and (m := re.fullmatch(r'return (.*);', lines[-1].text.strip())):
+                    ret = m.group(1)
+                    lines.pop()
+            elif re.fullmatch(r'S\d{6}', name):
+                if lines and lines[-1].text.strip() == 'return;':
+                    lines.pop()
+            else:
+                continue
+            if len([c for c in lines if c.text.strip()]) > self.inlinesize or \
+               [c for c in lines if re.match(r'return\b', c.text.strip())]:
+                continue
+            # 本体で使っている名前 (呼び出し元のローカル変数と重なれば展開しない)
+            text = '\n'.join([l.text for l in lines] + decl + ([ret] if ret else []))
+            text = re.sub(r'"(?:\\.|[^"\\])*"|\'(?:\\.|[^\'\\])*\'', '""', text)
+            idents = set(re.findall(r'[A-Za-z_]\w*', text)) - set(self.nsp.llist.get(name, {}))
+            body[name] = (decl, args, ret, lines, v.typename(True) if v and v.func else None, idents)
+
+        # 関数の呼び出し箇所に本体を展開する
+        r = []
+        n = 0
+        for k, c in enumerate(code):
+            m = None
+            if c.kind == BasCLine.STMT:
+                m = re.fullmatch(r'(?:(\w+(?:\[.*\])?) = )?(\w+)\((.*)\);', c.text.strip())
+            if not m or m.group(2) not in body:
+                r.append(c)
+                continue
+            name = m.group(2)
+            decl, args, ret, lines, fty, idents = body[name]
+            # 呼び出し元のローカル変数が本体で使うグローバル変数などを隠してしまう場合は展開しない
+            caller = [f[0] for f in funcs if f[1] <= k < f[2]]
+            if caller and idents & set(self.nsp.llist.get(caller[-1], {})):
+                r.append(c)
+                continue
+            if not fty:
+                if m.group(1) or m.group(3):
+                    r.append(c)
+                    continue
+                base = min([l.indent for l in lines]) if lines else 0
+                for l in lines:
+                    r.append(BasCLine(BasCLine.STMT, l.text, c.indent + l.indent - base, c.lineno))
+                self.report(f'サブルーチン {name} をインライン展開しました', c.lineno)
+                continue
+            a = self.splitargs(m.group(3))
+            if len(a) != len(args) or (m.group(1) and ret is None):
+                r.append(c)
+                continue
+            # 引数と変数の名前を呼び出し箇所ごとに変える
+            pre = f'_in{n}_'
+            n += 1
+            names = list(self.nsp.llist[name].keys())
+            i = c.indent + 1
+            r.append(BasCLine(BasCLine.STMT, '{', c.indent, c.lineno))
+            for d in decl:
+                r.append(BasCLine(BasCLine.STMT, rename(d, names, pre), i, c.lineno))
+            for v in args:
+                ty = 'unsigned char *' if v.type == BasVariable.STR else v.typename() + ' '
+                r.append(BasCLine(BasCLine.STMT, f'{ty}{pre}{v.name};', i, c.lineno))
+            # 引数は左から順に評価する
+            for v, e in zip(args, a):
+                r.append(BasCLine(BasCLine.STMT, f'{pre}{v.name} = {e};', i, c.lineno))
+            base = min([l.indent for l in lines]) if lines else 0
+            for l in lines:
+                r.append(BasCLine(BasCLine.STMT, rename(l.text, names, pre), i + l.indent - base, c.lineno))
+            if m.group(1):
+                # 戻り値は関数の型に変換してから代入する
+                r.append(BasCLine(BasCLine.STMT, f'{m.group(1)} = ({fty})({rename(ret, names, pre)});', i, c.lineno))
+            elif ret is not None and '(' in ret:
+                r.append(BasCLine(BasCLine.STMT, f'{rename(ret, names, pre)};', i, c.lineno))
+            r.append(BasCLine(BasCLine.STMT, '}', c.indent, c.lineno))
+            self.report(f'関数 {name} をインライン展開しました', c.lineno)
+        return r
+
+    def structure(self, code):
+        """GOTOによるループや条件分岐をwhile/do～while/if～elseのブロックに変換する"""
+        def label(c):
+            """ラベル行であればラベル名を返す"""
+            if c.kind == BasCLine.LABEL and (m := re.fullmatch(r'(L\d+):\n?', c.text)):
+                return m.group(1)
+            return None
+
+        def goto(c):
+            """goto文であれば飛び先のラベル名を返す"""
+            if c.kind == BasCLine.STMT and (m := re.fullmatch(r'goto (L\d+);', c.text.strip())):
+                return m.group(1)
+            return None
+
+        def ifgoto(i):
+            """i行目からが if (..) { goto L; } であれば条件式とラベル名を返す"""
+            if i + 2 < len(code) and code[i].kind == BasCLine.STMT and \
+               code[i + 2].kind == BasCLine.STMT and code[i + 2].text.strip() == '}':
+                if (m := re.fullmatch(r'if \((.*)\) \{', code[i].text.strip())) and (l := goto(code[i + 1])):
+                    return (m.group(1), l)
+            return None
+
+        def block(i, j, loop):
+            """i～j-1行目をひとつのブロックにまとめられるかを調べる"""
+            stack = []
+            for c in code[i:j]:
+                l = c.text.strip()
+                if c.kind == BasCLine.CCODE and not re.fullmatch(r'/\*===.*===\*/', l):
+                    return False
+                if l.startswith('}'):
+                    if not stack:
+                        return False
+                    stack.pop()
+                if not stack and re.match(r'(case\b.*|default):$', l):
+                    return False
+                # ループにするならbreak/continueの対象が変わらないことを確認する
+                if loop and (l == 'break;' and not [k for k in stack if k in 'LS'] or \
+                             l == 'continue;' and not [k for k in stack if k == 'L']):
+                    return False
+                if l.endswith('{'):
+                    stack.append('L' if re.match(r'(for|while|do)\b', l) else 'S' if l.startswith('switch') else 'B')
+            return not stack
+
+        def scan(i):
+            """i行目から、同じブロックの中にある行の番号を返す"""
+            depth = 0
+            for k in range(i, len(code)):
+                l = code[k].text.strip()
+                if l.startswith('}'):
+                    depth -= 1
+                    if depth < 0:
+                        return
+                if depth == 0:
+                    yield k
+                if l.endswith('{'):
+                    depth += 1
+
+        def loopend(i):
+            """i行目を囲むループの末尾の行番号を返す (ループの中でなければNone)"""
+            depth = 0
+            for k in range(i - 1, -1, -1):
+                l = code[k].text.strip()
+                if code[k].kind == BasCLine.LABEL and not label(code[k]):
+                    return None             # 関数の先頭
+                if l.endswith('{'):
+                    if depth == 0:
+                        if l.startswith('switch'):
+                            return None
+                        if re.match(r'(for|while|do)\b', l):
+                            e = k
+                            for e in scan(k + 1):
+                                pass
+                            return e + 1
+                    else:
+                        depth -= 1
+                if l.startswith('}'):
+                    depth += 1
+            return None
+
+        # ラベルごとのgotoの数
+        refs = {}
+        for c in code:
+            for l in re.findall(r'\bgoto (L\d+);', c.text):
+                refs[l] = refs.get(l, 0) + 1
+
+        def negate(cond):
+            """条件式を否定する"""
+            if m := re.fullmatch(r'-(\(.*\))', cond):
+                cond = m.group(1)
+            depth = 0
+            for i, ch in enumerate(cond):
+                depth += (ch == '(') - (ch == ')')
+                if depth == 0 and i < len(cond) - 1:
+                    return f'!({cond})'
+            return f'!{cond}' if cond[0] == '(' else f'!({cond})'
+
+        def indent(lines):
+            """ブロック内に入れる行のインデントを深くする"""
+            for c in lines:
+                if c.kind == BasCLine.STMT:
+                    c.indent += 1
+            return lines
+
+        def stmt(text, c):
+            r = BasCLine(BasCLine.STMT, text, c.indent, c.lineno)
+            r.pre = []
+            return r
+
+        def replace(a, b, new):
+            """a～b-1行目をnewに置き換える (削除される行のコメントは次の行に移す)"""
+            keep = [id(c) for c in new]
+            if new and a < b and id(code[a]) not in keep and id(new[0]) not in [id(c) for c in code[a:b]]:
+                new[0].pre = code[a].pre    # 置き換えた先頭行のコメントは新しい先頭行に付ける
+                code[a].pre = []
+            pre = []
+            for c in code[a:b]:
+                if id(c) in keep:
+                    c.pre = pre + c.pre
+                    pre = []
+                else:
+                    pre += c.pre
+            if b < len(code):
+                code[b].pre = pre + code[b].pre
+            else:
+                tail[:0] = pre
+            code[a:b] = new
+
+        # BASICの行コメントは次の行に付けておく
+        r = []
+        tail = []
+        for c in code:
+            if c.kind == BasCLine.CCODE and re.fullmatch(r'\s*/\*===.*===\*/\s*', c.text):
+                tail.append(c)
+            else:
+                c.pre = tail
+                tail = []
+                r.append(c)
+        code = r
+
+        changed = True
+        while changed:
+            changed = False
+            i = 0
+            while i < len(code):
+                c = code[i]
+                # 直後のラベルへのgotoを削除する
+                if (l := goto(c)) and i + 1 < len(code) and label(code[i + 1]) == l:
+                    replace(i, i + 1, [])
+                    refs[l] -= 1
+                    changed = True
+                    continue
+
+                if l := label(c):
+                    # Lx: if (c) { goto Ly; } .. goto Lx; Ly: -> while (!c) { .. }
+                    if (ig := ifgoto(i + 1)):
+                        for k in scan(i + 4):
+                            if k + 1 < len(code) and goto(code[k]) == l and \
+                               label(code[k + 1]) == ig[1] and block(i + 4, k, True):
+                                new = [c] if refs[l] > 1 else []
+                                new.append(stmt(f'while ({negate(ig[0])}) ' + '{', code[i + 1]))
+                                new += indent(code[i + 4:k])
+                                new.append(stmt('}', code[i + 1]))
+                                if refs[ig[1]] > 1:
+                                    new.append(code[k + 1])
+                                replace(i, k + 2, new)
+                                refs[l] -= 1
+                                refs[ig[1]] -= 1
+                                self.report('GOTO によるループを while に変換しました', c.lineno or code[i + 1].lineno)
+                                changed = True
+                                break
+                        if changed:
+                            i += 1
+                            continue
+                    # Lx: .. if (c) { goto Lx; } -> do { .. } while (c);
+                    # Lx: .. goto Lx;            -> for (;;) { .. }
+                    for k in scan(i + 1):
+                        ig = ifgoto(k)
+                        if ig and ig[1] == l:
+                            if block(i + 1, k, True):
+                                new = [c] if refs[l] > 1 else []
+                                new.append(stmt('do {', code[k]))
+                                new += indent(code[i + 1:k])
+                                new.append(stmt('} ' + f'while ({ig[0]});', code[k]))
+                                replace(i, k + 3, new)
+                                refs[l] -= 1
+                                self.report('GOTO によるループを do ～ while に変換しました', code[k].lineno)
+                                changed = True
+                            break
+                        if goto(code[k]) == l:
+                            if block(i + 1, k, True):
+                                new = [c] if refs[l] > 1 else []
+                                new.append(stmt('for (;;) {', code[k]))
+                                new += indent(code[i + 1:k])
+                                new.append(stmt('}', code[k]))
+                                replace(i, k + 1, new)
+                                refs[l] -= 1
+                                self.report('GOTO によるループを for (;;) に変換しました', code[k].lineno)
+                                changed = True
+                            break
+
+                elif (ig := ifgoto(i)) and (e := loopend(i)) and e + 1 < len(code) and label(code[e + 1]) == ig[1]:
+                    # ループ直後へのgotoをbreakにする
+                    code[i + 1].text = 'break;'
+                    refs[ig[1]] -= 1
+                    self.report('ループを抜ける GOTO を break に変換しました', c.lineno)
+                    changed = True
+
+                elif (l := c.text.strip()) == 'for (;;) {' and c.kind == BasCLine.STMT:
+                    # for (;;) { .. if (c) { break; } } -> do { .. } while (!c);
+                    e = i
+                    for e in scan(i + 1):
+                        pass
+                    e += 1
+                    if e - i >= 4 and code[e].text.strip() == '}' and \
+                       code[e - 1].text.strip() == '}' and code[e - 2].text.strip() == 'break;' and \
+                       (m := re.fullmatch(r'if \((.*)\) \{', code[e - 3].text.strip())) and \
+                       block(i + 1, e - 3, True) and \
+                       not [d for d in code[i + 1:e - 3] if d.text.strip() == 'continue;' and d.indent == c.indent + 1]:
+                        code[i].text = 'do {'
+                        code[e].text = '} ' + f'while ({negate(m.group(1))});'
+                        replace(e - 3, e, [])
+                        changed = True
+
+                elif ig := ifgoto(i):
+                    # if (c) { goto La; } A goto Lb; La: B Lb: -> if (!c) { A } else { B }
+                    # if (c) { goto La; } A La:                -> if (!c) { A }
+                    for m in scan(i + 3):
+                        if label(code[m]) == ig[1]:
+                            break
+                    else:
+                        m = 0
+                    if m > i + 3 and block(i + 3, m, False) and \
+                       [d for d in code[i + 3:m] if d.kind == BasCLine.STMT]:
+                        new = [stmt(f'if ({negate(ig[0])}) ' + '{', c)]
+                        lb = goto(code[m - 1])
+                        for n in scan(m + 1) if lb else ():
+                            if label(code[n]) == lb:
+                                break
+                        else:
+                            n = 0
+                        if n and block(m + 1, n, False):
+                            new += indent(code[i + 3:m - 1])
+                            new.append(stmt('} else {', c))
+                            if refs[ig[1]] > 1:
+                                new.append(code[m])
+                            new += indent(code[m + 1:n])
+                            new.append(stmt('}', c))
+                            if refs[lb] > 1:
+                                new.append(code[n])
+                            replace(i, n + 1, new)
+                            refs[ig[1]] -= 1
+                            refs[lb] -= 1
+                            self.report('GOTO による条件分岐を if ～ else に変換しました', c.lineno)
+                        else:
+                            new += indent(code[i + 3:m])
+                            new.append(stmt('}', c))
+                            if refs[ig[1]] > 1:
+                                new.append(code[m])
+                            replace(i, m + 1, new)
+                            refs[ig[1]] -= 1
+                            self.report('GOTO による条件分岐を if に変換しました', c.lineno)
+                        changed = True
+                i += 1
+
+        # 参照されなくなったラベルを削除する
+        replace(0, len(code), [c for c in code if not (l := label(c)) or refs.get(l, 0) > 0])
+        r = []
+        for c in code:
+            r += c.pre + [c]
+        return r + tail
+
+    def purefuncs(self):
+        """副作用がなく引数だけで値が決まるC関数の {関数名: 戻り値の型} を得る"""
+        r = { 'fabs': 'double' }
+        for ex in BasKeyword.exfnlist.values():
+            if ex.pure:
+                r[ex.cfunc or ex.name] = 'double' if ex.type == 'F' else 'int'
+        return r
+
+    def carrays(self, fname):
+        """関数内で使える文字列以外の配列の {配列名: (要素の型, 次元数)} を得る"""
+        r = {}
+        for ls in (self.nsp.glist, self.nsp.llist.get(fname, {})):
+            for k, v in ls.items():
+                if v.isarray() and v.type < BasVariable.STATICCONST and v.type != BasVariable.DIM_STR:
+                    r[k] = (v.typename(), len(re.findall(r'\[[^\[\]]*\]', v.arg)))
+                elif k in r:
+                    del r[k]                # ローカル変数で隠されるグローバル配列
+        return r
+
+    @staticmethod
+    def bracketend(s, i):
+        """s[i] の括弧に対応する閉じ括弧の次の位置を得る"""
+        depth = 0
+        for j in range(i, len(s)):
+            if s[j] in '([':
+                depth += 1
+            elif s[j] in ')]':
+                depth -= 1
+                if depth == 0:
+                    return j + 1
+        return None
+
+    def cterms(self, s, pure, arr):
+        """Cの式 s に含まれる関数呼び出しと配列要素の (開始位置, 終了位置, 型) のリストを得る
+           (純粋でない関数の呼び出しは型を None とし、括弧の対応が取れなければ None を返す)"""
+        # 文字列定数の中の括弧を数えないようにする
+        s = re.sub(r'"(\\.|[^"\\])*"|\'(\\.|[^\'\\])*\'', lambda m: '"' + '_' * (len(m.group(0)) - 2) + '"', s)
+        r = []
+        for m in re.finditer(r'\b([A-Za-z_]\w*)(?=[\(\[])', s):
+            n = m.group(1)
+            if (e := self.bracketend(s, m.end())) == None:
+                return None
+            if s[m.end()] == '(':
+                ty = pure.get(n)
+            else:
+                dim = 1
+                while e < len(s) and s[e] == '[' and (e := self.bracketend(s, e)) != None:
+                    dim += 1
+                if e == None:
+                    return None
+                if n not in arr or arr[n][1] != dim:
+                    continue
+                ty = arr[n][0]
+            if ty and re.search(r'(^|[^&])&\s*$', s[:m.start()]):
+                continue                    # アドレスを取る式は扱わない
+            r.append((m.start(), e, ty))
+        return r
+
+    def cwrites(self, text, pure, ptrs):
+        """Cの文 text の中で値が変わる可能性のある変数の名前と、呼び出している関数の名前を得る
+           (ptrs は関数に渡されると書き換えられる可能性のある配列と文字列変数の名前)"""
+        # 代入、インクリメント/デクリメント、アドレスを取る変数
+        w = set(re.findall(r'\b([A-Za-z_]\w*)\s*(?:\[[^;]*?\])*\s*(?:[-+*/%&|^]|<<|>>)?=(?!=)', text))
+        w |= set(re.findall(r'(?:\+\+|--)\s*([A-Za-z_]\w*)', text))
+        w |= set(re.findall(r'\b([A-Za-z_]\w*)\s*(?:\[[^;]*?\])*\s*(?:\+\+|--)', text))
+        w |= set(re.findall(r'(?<!&)&(?!&)\s*([A-Za-z_]\w*)', text))
+        # 純粋でない関数に渡される配列や文字列変数 (bas2c.def で入力とされている引数は除く)
+        carg = { ex.cfunc: ex.carg.split(',') for ex in BasKeyword.exfnlist.values() if ex.cfunc }
+        calls = set()
+        for m in re.finditer(r'\b([A-Za-z_]\w*)\s*\(', text):
+            if m.group(1) in pure or m.group(1) in ('if', 'for', 'while', 'switch', 'return', 'sizeof'):
+                continue
+            calls.add(m.group(1))
+            if (e := self.bracketend(text, m.end() - 1)) == None:
+                return None, calls
+            args = self.splitargs(text[m.end():e - 1])
+            spec = carg.get(m.group(1), [])
+            for k, a in enumerate(args):
+                if len(spec) == len(args) and spec[k] == '%':
+                    continue
+                # 引数の中の関数呼び出しに渡されるものはその関数で調べる (sizeof() は除く)
+                while n := re.search(r'\b(?!sizeof\b)[A-Za-z_]\w*\s*\(', a):
+                    a = a[:n.start()] + a[self.bracketend(a, n.end() - 1) or len(a):]
+                w |= set(re.findall(r'\b[A-Za-z_]\w*\b', a)) & ptrs
+        return w, calls
+
+    def licm(self, code):
+        """ループ内で値が変わらない式を、ループの前で一度だけ求めるようにする"""
+        pure = self.purefuncs()
+        regions = self.cfunctions(code)
+        funcs = { x[0] for x in regions }
+        ptrs = set()
+        for ls in [self.nsp.glist] + list(self.nsp.llist.values()):
+            ptrs |= { k for k, v in ls.items() if v.isarray() or v.type == BasVariable.STR }
+
+        def iscomment(c):
+            return c.kind == BasCLine.CCODE and re.fullmatch(r'\s*(/\*.*\*/)?\s*', c.text)
+
+        # 関数ごとに、呼び出す関数も含めて値を変える可能性のあるグローバル変数を求める
+        # (インラインCのコードがある関数はすべての変数を変える可能性があるものとして None とする)
+        writes = {}
+        calls = {}
+        for fname, s, e in regions:
+            w, cs = self.cwrites('\n'.join(c.text for c in code[s:e] if c.kind == BasCLine.STMT), pure, ptrs)
+            if [c for c in code[s:e] if c.kind == BasCLine.CCODE and not iscomment(c)]:
+                w = None
+            writes[fname] = w - set(self.nsp.llist.get(fname, {})) if w != None else None
+            calls[fname] = cs & funcs
+        changed = True
+        while changed:
+            changed = False
+            for f in writes:
+                for g in calls[f]:
+                    if writes[f] == None:
+                        break
+                    if writes[g] == None:
+                        writes[f] = None
+                        changed = True
+                    elif not writes[g] <= writes[f]:
+                        writes[f] |= writes[g]
+                        changed = True
+
+        def loopend(i):
+            """ループの先頭に対応する '}' の行を得る"""
+            depth = 0
+            for j in range(i, len(code)):
+                if code[j].kind != BasCLine.STMT:
+                    continue
+                l = code[j].text.strip()
+                if l.startswith('}'):
+                    depth -= 1
+                    if depth == 0:
+                        return j
+                if l.endswith('{'):
+                    depth += 1
+            return None
+
+        def invariant(x, w, arr):
+            """式 x が純粋な関数の呼び出しだけでできていて、ループ内で値が変わらないかを調べる"""
+            if not x.endswith(')') or re.search(r'[/%\[]', x):
+                return False        # ゼロ除算や範囲外の参照を起こしうる式はループの外に出さない
+            if (ts := self.cterms(x, pure, arr)) == None or [t for t in ts if t[2] == None]:
+                return False
+            return not set(re.findall(r'\b[A-Za-z_]\w*\b(?!\s*\()', x)) & w
+
+        tmpno = 0
+        i = 0
+        while i < len(code):
+            c = code[i]
+            m = None
+            if c.kind == BasCLine.STMT:
+                m = re.fullmatch(r'(for \((\w+) = .*?; \2 <= )(.*)(; \2\+\+\) \{)', c.text) or \
+                    re.fullmatch(r'(while \()()(.*)(\) \{)', c.text) or re.fullmatch(r'()()()(do \{)', c.text)
+            if not m or (j := loopend(i)) == None:
+                i += 1
+                continue
+            body = code[i + 1:j]
+            # ラベル (外からの飛び込み) やインラインCのコードがあるループは扱わない
+            if [b for b in body if b.kind != BasCLine.STMT and not iscomment(b)]:
+                i += 1
+                continue
+            w, cs = self.cwrites('\n'.join(b.text for b in [c] + body + [code[j]] if b.kind == BasCLine.STMT),
+                                 pure, ptrs)
+            for f in cs & funcs:
+                w = w | writes[f] if w != None and writes[f] != None else None
+            if w == None:
+                i += 1
+                continue
+            # 関数の外 (main関数を閉じた後) にあるループは対象にしない
+            fname = [x[0] for x in regions if x[1] <= i < x[2]]
+            if not fname:
+                i += 1
+                continue
+            arr = self.carrays(fname[-1])
+
+            # ループの条件式 (for は終了値) と本体から、値が変わらない純粋な関数の呼び出しを探す
+            head, cond, tail = m.group(1), m.group(3), m.group(4)
+            lines = [b for b in body if b.kind == BasCLine.STMT] + [code[j]]
+            decls = []
+            while True:
+                found = [(s[t[0]:t[1]], t[2]) for s in [cond] + [b.text for b in lines]
+                         for t in self.cterms(s, pure, arr) or [] if t[2] and invariant(s[t[0]:t[1]], w, arr)]
+                if not found:
+                    break
+                x, ty = max(found, key=lambda f: len(f[0]))
+                tmp = f'_inv{tmpno}'
+                tmpno += 1
+                def subst(s):
+                    while t := [t for t in self.cterms(s, pure, arr) or [] if s[t[0]:t[1]] == x]:
+                        s = s[:t[0][0]] + tmp + s[t[0][1]:]
+                    return s
+                cond = subst(cond)
+                for b in lines:
+                    b.text = subst(b.text)
+                decls.append(f'{ty} {tmp} = {x};')
+                self.report(f'ループ内で値が変わらない式 {x} をループの前で求めるようにしました', c.lineno)
+            if not decls:
+                i += 1
+                continue
+            c.text = head + cond + tail
+
+            # 一時変数を定義するブロックでループを囲む
+            for b in code[i:j + 1]:
+                if b.kind == BasCLine.STMT:
+                    b.indent += 1
+            new = [BasCLine(BasCLine.STMT, '{', c.indent - 1, c.lineno)] + \
+                  [BasCLine(BasCLine.STMT, d, c.indent, c.lineno) for d in decls]
+            code[i:i] = new
+            j += len(new)
+            code[j + 1:j + 1] = [BasCLine(BasCLine.STMT, '}', c.indent - 1, code[j].lineno)]
+            i += len(new) + 1
+        return code
+
+    def cse(self, code):
+        """1つの文の中で同じ値を何度も求める式を、文の前で一時変数に求めるようにする"""
+        pure = self.purefuncs()
+
+        def terms(s, arr):
+            """式 s に含まれる関数呼び出しと配列要素のリストを得る (純粋でない関数の呼び出しがあれば None)"""
+            r = self.cterms(s, pure, arr)
+            return None if r == None or [t for t in r if t[2] == None] else r
+
+        def subst(s, x, tmp):
+            """式 s に含まれる x を tmp に置き換える"""
+            while t := [t for t in terms(s, arr) if s[t[0]:t[1]] == x]:
+                s = s[:t[0][0]] + tmp + s[t[0][1]:]
+            return s
+
+        regions = self.cfunctions(code)
+        tmpno = 0
+        r = []
+        for i, c in enumerate(code):
+            if c.kind != BasCLine.STMT:
+                r.append(c)
+                continue
+            # 代入文 (a = 式;) と関数呼び出しの文 (f(式, ..);) が対象
+            m = re.fullmatch(r'((?:[A-Za-z_]\w*(?:\[.*?\])*) = )(.*)(;)', c.text) or \
+                re.fullmatch(r'([A-Za-z_]\w*\()(.*)(\);)', c.text)
+            if not m or re.search(r'(\+\+|--|[^=!<>]=[^=]|["\'])', m.group(2)) or \
+               (m.group(3) == ');' and self.bracketend(c.text, len(m.group(1)) - 1) != len(c.text) - 1):
+                r.append(c)
+                continue
+            head, expr, tail = m.group(1), m.group(2), m.group(3)
+            # 右辺全体が関数呼び出しなら引数だけを対象にする (引数は呼び出しより先に評価される)
+            if (m := re.fullmatch(r'([A-Za-z_]\w*\()(.*)\)', expr)) and \
+               self.bracketend(expr, len(m.group(1)) - 1) == len(expr):
+                head, expr, tail = head + m.group(1), m.group(2), ')' + tail
+            # 関数の外 (main関数を閉じた後) にある文は対象にしない
+            fname = [x[0] for x in regions if x[1] <= i < x[2]]
+            if not fname:
+                r.append(c)
+                continue
+            arr = self.carrays(fname[-1])
+            decls = []
+            while (ts := terms(expr, arr)):
+                # 一時変数を定義する式の中も含めて、2回以上現れる最も長い式を探す
+                found = {}
+                for s, x in [(expr, t) for t in ts] + [(d[2], t) for d in decls for t in terms(d[2], arr) or []]:
+                    x = (s[x[0]:x[1]], x[2])
+                    found[x] = found.get(x, 0) + 1
+                found = sorted([x for x, n in found.items() if n >= 2], key=lambda x: len(x[0]), reverse=True)
+                if not found:
+                    break
+                x, ty = found[0]
+                tmp = f'_cse{tmpno}'
+                tmpno += 1
+                expr = subst(expr, x, tmp)
+                decls = [(d[0], d[1], subst(d[2], x, tmp)) for d in decls]
+                # 一時変数を使う式があればその前に、なければ最後に定義する
+                k = ([k for k, d in enumerate(decls) if re.search(rf'\b{tmp}\b', d[2])] + [len(decls)])[0]
+                decls.insert(k, (ty, tmp, x))
+                self.report(f'式 {x} を一時変数 {tmp} にまとめました', c.lineno)
+            if not decls:
+                r.append(c)
+                continue
+            # 一時変数を定義するブロックで文を囲む
+            r.append(BasCLine(BasCLine.STMT, '{', c.indent, c.lineno))
+            for ty, tmp, x in decls:
+                r.append(BasCLine(BasCLine.STMT, f'{ty} {tmp} = {x};', c.indent + 1, c.lineno))
+            r.append(BasCLine(BasCLine.STMT, head + expr + tail, c.indent + 1, c.lineno))
+            r.append(BasCLine(BasCLine.STMT, '}', c.indent, c.lineno))
+        return r
+
+    def rowbase(self, code):
+        """for ループ内で不変な多次元配列の行の先頭アドレスをループの外で求めるようにする"""
+        funcs = set(k for k, v in self.nsp.glist.items() if v.func)
+
+        def arrays(fname):
+            """関数内で使える2次元以上の配列の (要素の型, 次元数) を得る"""
+            r = {}
+            for ls in (self.nsp.glist, self.nsp.llist.get(fname, {})):
+                for k, v in ls.items():
+                    if v.isarray() and v.type < BasVariable.STATICCONST and v.type != BasVariable.DIM_STR:
+                        n = len(re.findall(r'\[[^\[\]]*\]', v.arg))
+                        if n >= 2:
+                            r[k] = (v.typename(), n)
+                        elif k in r:
+                            del r[k]        # ローカル変数で隠されるグローバル配列
+                    elif k in r:
+                        del r[k]
+            return r
+
+        def loopend(i):
+            """for 文に対応する '}' の行を得る"""
+            depth = 0
+            for j in range(i, len(code)):
+                if code[j].kind != BasCLine.STMT:
+                    continue
+                l = code[j].text.strip()
+                if l.startswith('}'):
+                    depth -= 1
+                    if depth == 0:
+                        return j
+                if l.endswith('{'):
+                    depth += 1
+            return None
+
+        def invariant(x, body, var):
+            """添字の式 x がループ内で変化しないかを調べる"""
+            if re.search(r'\w\s*\(', x) or '[' in x:
+                return False        # 関数呼び出しや配列を含む式は扱わない
+            for n in re.findall(r'\b[a-zA-Z_]\w*\b', x):
+                if n == var or \
+                   re.search(rf'(\b{n}\s*(=[^=]|\+\+|--|[-+*/%&|^]=)|(\+\+|--|&)\s*{n}\b)', body):
+                    return False
+            return True
+
+        rowno = 0
+        regions = self.cfunctions(code)
+        i = 0
+        while i < len(code):
+            c = code[i]
+            m = re.fullmatch(r'for \((\w+) = .*; \1 <= .*; \1\+\+\) \{', c.text) if c.kind == BasCLine.STMT else None
+            if not m or (j := loopend(i)) == None:
+                i += 1
+                continue
+            body = code[i + 1:j]
+            text = '\n'.join(b.text for b in body if b.kind == BasCLine.STMT)
+            # 最も内側のループで、ラベル (外からの飛び込み) やユーザ関数の呼び出しがないものが対象
+            if re.search(r'\bfor \(', text) or [b for b in body if b.kind == BasCLine.LABEL] or \
+               re.search(r'\bS\d{6}\(', text) or \
+               [n for n in re.findall(r'\b(\w+)\(', text) if n in funcs]:
+                i += 1
+                continue
+            fname = [r[0] for r in regions if r[1] <= i < r[2]][-1]
+            arr = arrays(fname)
+            rows = {}
+            for a in re.finditer(r'\b(\w+)((?:\[[^\[\]]*\])+)', text):
+                if a.group(1) not in arr:
+                    continue
+                ty, n = arr[a.group(1)]
+                subs = re.findall(r'\[([^\[\]]*)\]', a.group(2))
+                if len(subs) != n or not all(invariant(x, text, m.group(1)) for x in subs[:-1]):
+                    continue
+                row = a.group(1) + ''.join(f'[{x}]' for x in subs[:-1])
+                if row not in rows:
+                    rows[row] = (f'_row{rowno}', ty)
+                    rowno += 1
+            if not rows:
+                i += 1
+                continue
+
+            # 行の先頭アドレスを持つポインタを定義するブロックでループを囲む
+            for b in body:
+                if b.kind == BasCLine.STMT:
+                    for row, (p, _) in rows.items():
+                        b.text = re.sub(r'\b' + re.escape(row) + r'(?=\[)', p, b.text)
+            for b in code[i:j + 1]:
+                if b.kind == BasCLine.STMT:
+                    b.indent += 1
+            new = [BasCLine(BasCLine.STMT, '{', c.indent - 1, c.lineno)]
+            for row, (p, ty) in rows.items():
+                new.append(BasCLine(BasCLine.STMT, f'{ty} *{p} = {row};', c.indent, c.lineno))
+                self.report(f'配列 {row} の先頭アドレスをループの外で求めるようにしました', c.lineno)
+            code[i:i] = new
+            j += len(new)
+            code[j + 1:j + 1] = [BasCLine(BasCLine.STMT, '}', c.indent - 1, code[j].lineno)]
+            i = j + 2
+        return code
+
+    def deadcode(self, code):
+        """実行されないコード、呼び出されない関数、使われない変数を削除する"""
+        def iscomment(c):
+            return c.kind == BasCLine.CCODE and re.fullmatch(r'\s*/\*===.*===\*/\s*', c.text)
+
+        # 無条件ジャンプの後にある、ラベルを経由せずに到達しない文を削除する
+        jump = re.compile(r'(goto L\d+|return\b.*|b_exit\(.*\)|exit\(.*\)|break|continue);')
+        infunc = [False] * len(code)
+        for f in self.cfunctions(code):
+            infunc[f[1]:f[2]] = [True] * (f[2] - f[1])
+        r = []
+        i = 0
+        while i < len(code):
+            c = code[i]
+            r.append(c)
+            i += 1
+            if c.kind != BasCLine.STMT or not infunc[i - 1] or not jump.fullmatch(c.text.strip()):
+                continue
+            depth = 0
+            j = i
+            while j < len(code):
+                d = code[j]
+                l = d.text.strip()
+                if iscomment(d):
+                    pass
+                elif (d.kind == BasCLine.LABEL and re.fullmatch(r'L\d+:', l)) or d.kind == BasCLine.CCODE:
+                    if depth > 0:               # ブロック内への飛び込みがあるなら削除しない
+                        j = i
+                    break
+                elif l.startswith('}') or re.match(r'(case\b.*|default):$', l):
+                    if depth == 0:
+                        break
+                    depth -= l.startswith('}')
+                if l.endswith('{'):
+                    depth += 1
+                j += 1
+            while j > i and iscomment(code[j - 1]):
+                j -= 1                          # 次の文のコメントは残す
+            if (n := len([d for d in code[i:j] if d.kind == BasCLine.STMT])) > 0:
+                self.report(f'実行されない {n} 行を削除しました', code[i].lineno)
+            i = j
+        code = r
+
+        # main関数から呼び出されない関数を削除する
+        funcs = self.cfunctions(code)
+        calls = {}
+        for f in funcs:
+            calls[f[0]] = set(re.findall(r'\b(\w+)\s*\(', ''.join(c.text for c in code[f[1]:f[2]])))
+        used = set()
+        left = ['main']
+        while left:
+            f = left.pop()
+            if f not in used:
+                used.add(f)
+                left += [g for g in calls[f] if g in calls]
+        for f in reversed(funcs):
+            if f[0] not in used:
+                self.report(f'呼び出されない関数 {f[0]} を削除しました')
+                del code[f[1]:f[2]]
+                if v := self.nsp.glist.get(f[0], None):
+                    if v.func:
+                        del self.nsp.glist[f[0]]
+                self.subr = [l for l in self.subr if f'S{l:06d}' != f[0]]
+
+        # 使われないグローバル変数と補助関数を削除する
+        text = re.sub(r'"[^"\n]*"', '', ''.join(c.text for c in code))
+        while True:
+            names = set(re.findall(r'[A-Za-z_]\w*', text))
+            for v in self.nsp.glist.values():
+                if v.func or v.name in names:
+                    names.update(re.findall(r'[A-Za-z_]\w*', v.arg + v.init))
+            for d in self.extdef.values():
+                names.update(re.findall(r'[A-Za-z_]\w*', d))
+            unused = [k for k, v in self.nsp.glist.items() if not v.func and k not in names]
+            unused += [k for k in self.extdef if k not in names]
+            if not unused:
+                break
+            for k in unused:
+                if k in self.extdef:
+                    del self.extdef[k]
+                else:
+                    self.report(f'使われない変数 {k} を削除しました')
+                    del self.nsp.glist[k]
+        self.strtmp_max = max([int(n) + 1 for n in re.findall(r'\bstrtmp(\d+)\b', text)] + [0])
+
+        # 使われなくなった関数グループの#includeを削除する
+        for e in sorted(self.exfngroup):
+            if not e:
+                continue
+            fn = { (ex.cfunc if ex.cfunc else ex.name) for ex in BasKeyword.exfnlist.values() if ex.group == e }
+            if not fn & names:
+                self.report(f'使われない #include <{e.lower()}.h> を削除しました')
+                self.exfngroup.discard(e)
+        return code
+
+    def profile(self, code):
+        """BASICの各行の先頭の文に実行回数を数えるカウンタを挿入する"""
+        index = {}
+        r = []
+        last = None
+        depth = 1
+        for c in code:
+            l = c.text.strip()
+            if c.kind == BasCLine.STMT and depth >= 1:
+                # プログラム終了時にカウンタの値をファイルに出力する
+                if m := re.fullmatch(rf'{self.b_exit}\((.*)\);', l):
+                    c = BasCLine(c.kind, f'_profexit({m.group(1)});', c.indent, c.lineno)
+                if c.lineno != last and l and not l.startswith('}') and not c.text.startswith('\t') and \
+                   not re.match(r'(case\b.*|default):$', l):
+                    if c.lineno not in index:
+                        index[c.lineno] = len(index)
+                    r.append(BasCLine(c.kind, f'_prof[{index[c.lineno]}]++;', c.indent, c.lineno))
+                    last = c.lineno
+            elif c.kind == BasCLine.LABEL:
+                last = None
+            r.append(c)
+            if l.startswith('}'):
+                depth -= 1
+            if l.endswith('{'):
+                depth += 1
+
+        n = max(len(index), 1)
+        name = re.sub(r'\.[^.]*$', '', re.split(r'[/\\:]', self.finame)[-1]) if self.finame != '<stdin>' else 'bas2c'
+        self.extdef['_prof'] = \
+            f'static unsigned int _prof[{n}];\n' \
+            f'static const int _profline[{n}] = {{' + ','.join(str(k) for k in index) + '};\n' \
+            f'\nstatic void _profexit(int status)\n{{\n' \
+            '\tFILE *fp;\n\tint i;\n\n' \
+            f'\tif ((fp = fopen("{name}.prf", "w")) != NULL) {{\n' \
+            f'\t\tfprintf(fp, "# {self.finame}\\n");\n' \
+            f'\t\tfor (i = 0; i < {len(index)}; i++)\n' \
+            '\t\t\tfprintf(fp, "%d\\t%u\\n", _profline[i], _prof[i]);\n' \
+            '\t\tfclose(fp);\n\t}\n' \
+            f'\t{self.b_exit}(status);\n}}\n'
+        self.report(f'{len(index)} 行に実行回数のカウンタを挿入しました')
+        return r
+
+    def peephole(self, code):
+        """連続するPRINT文の文字列定数出力をまとめ、重複する文字列定数を共有する"""
+        # 連続する b_sprint("..") と b_sprint(STRCRLF) を1回の呼び出しにまとめる
+        r = []
+        prev = None
+        for c in code:
+            m = None
+            if c.kind == BasCLine.STMT:
+                m = re.fullmatch(r'(b_sl?print)\(("[^"]*"|STRCRLF)\);', c.text)
+            if not m:
+                r.append(c)
+                prev = None
+                continue
+            lit = m.group(2) if m.group(2) != 'STRCRLF' else '"\\r\\n"'
+            if prev and prev[0] == m.group(1) and prev[1].indent == c.indent:
+                prev[2] += lit[1:-1]
+                prev[1].text = f'{prev[0]}("{prev[2]}");'
+                continue
+            r.append(c)
+            prev = [m.group(1), c, lit[1:-1]]
+
+        # 読み出しにのみ使われる文字列定数を数える
+        def literals(text):
+            """文字列定数のうち、読み出し専用の関数引数になっているものの位置を返す"""
+            rdonly = ('b_sprint', 'b_slprint', 'b_strncpy', 'b_stradd', 'b_strcmp')
+            res = []
+            stack = []
+            i = 0
+            while i < len(text):
+                ch = text[i]
+                if ch == "'":                   # 文字定数 ('"' など) は読み飛ばす
+                    if not (m := re.match(r"'(?:\\.|[^'\\])*'", text[i:])):
+                        break
+                    i += m.end()
+                    continue
+                if ch == '"':
+                    if not (m := re.match(r'"(?:\\.|[^"\\])*"', text[i:])):
+                        break
+                    j = i + m.end()
+                    pre = text[:i].rstrip()[-1:]
+                    post = text[j:].lstrip()[:1]
+                    if stack and stack[-1] in rdonly and pre in '(,' and post in '),':
+                        res.append((i, j))
+                    i = j
+                    continue
+                if ch == '(':
+                    m = re.search(r'(\w*)\s*$', text[:i])
+                    stack.append(m.group(1))
+                elif ch == ')' and stack:
+                    stack.pop()
+                i += 1
+            return res
+
+        count = {}
+        for c in r:
+            if c.kind == BasCLine.STMT and '"' in c.text:
+                for i, j in literals(c.text):
+                    count[c.text[i:j]] = count.get(c.text[i:j], 0) + 1
+
+        # 複数回使われる文字列定数を配列にする
+        pool = {}
+        for l, n in count.items():
+            if n > 1:
+                pool[l] = f'_strlit{len(pool):04d}'
+                self.extdef[pool[l]] = f'static unsigned char {pool[l]}[] = {l};\n'
+        if pool:
+            for c in r:
+                if c.kind == BasCLine.STMT and '"' in c.text:
+                    for i, j in reversed(literals(c.text)):
+                        if c.text[i:j] in pool:
+                            c.text = c.text[:i] + pool[c.text[i:j]] + c.text[j:]
+        return r
+
     def error(self, e, finame):
         self.exitstatus = 1
+        self.errcount += 1
         print(f'{finame:s}:{self.t.getlineno()}\t: error: {e}')
+        self.diagout('error', str(e), line=self.t.lineno, basline=self.t.baslineno,
+                     column=len(self.t.curline) - self.t.prelen if self.t.curline else 0,
+                     **{ 'pass': self.bpass, 'class': type(e).__name__ })
         if self.t.curline:
             print(self.t.curline,end='')
             print(' ' * (len(self.t.curline) - self.t.prelen) + '^')
+        if self.toomanyerrors():
+            print(f'{finame:s}\t: error: エラーが {self.errcount} 個になったので変換を中止します')
+            self.diagout('error', f'エラーが {self.errcount} 個になったので変換を中止します',
+                         **{ 'pass': self.bpass, 'class': 'limit' })
+
+    def toomanyerrors(self):
+        """エラーの数が上限に達したかを調べる"""
+        return self.maxerrors > 0 and self.errcount >= self.maxerrors
 
 ##############################################################################
 
+def clock():
+    """経過時間の測定に使う時刻を得る"""
+    import time
+    return time.perf_counter() if hasattr(time, 'perf_counter') else time.time()
+
 def readdef():
     """組込/外部関数の定義ファイルを読み込む"""
     import os
@@ -1598,13 +3539,211 @@ def fileencoding(fname):
         return 'cp932'
     return 'utf-8'
 
+def outname(finame):
+    """入力ファイル名から出力ファイル名を得る"""
+    return finame.replace('.bas','').replace('.BAS','') + '.c'
+
+def deps():
+    """変換結果が依存するファイル (bas2c.py と bas2c.def) のリストを得る"""
+    import os
+    sdir = os.path.dirname(os.path.abspath(__file__))
+    return [sdir + '/bas2c.py', sdir + '/bas2c.def']
+
+def uptodate(finame, foname, others=[]):
+    """出力ファイルが入力ファイルや bas2c.py、bas2c.def より新しいかを調べる"""
+    import os
+    try:
+        t = os.stat(foname).st_mtime
+        for f in others:
+            t = min(t, os.stat(f).st_mtime)
+        return all(os.stat(f).st_mtime <= t for f in [finame] + deps())
+    except OSError:
+        return False
+
+def writedeps(finame, foname, depfile, manifest, b):
+    """makefile用の依存関係ファイルと、インクルードするヘッダファイルのリストを出力する"""
+    def esc(f):
+        return f.replace(' ', '\\ ')
+    if depfile:
+        with open(depfile, 'w') as f:
+            f.write(' '.join(esc(o) for o in [foname] + b.outfiles) + ': ' +
+                    ' '.join(esc(d) for d in [finame] + deps()) + '\n')
+    if manifest:
+        with open(manifest, 'w') as f:
+            for h in b.includes():
+                f.write(h + '\n')
+
+def convert(finame, foname, focode, flag, cindent, inlinesize, incremental=None, depfile=None, manifest=None, maxerrors=0,
+            diag=None, split=False):
+    """1つのファイルを変換して終了コードを返す"""
+    try:
+        fh = open(finame, 'r', encoding=fileencoding(finame)) if finame else sys.stdin
+    except:
+        print(f'{sys.argv[0]}: {finame} file not found')
+        return 1
+
+    try:
+        fo = open(foname, 'w', encoding=focode) if foname and foname != '-' else sys.stdout
+    except:
+        print(f'{sys.argv[0]}: cannot create output file {foname}')
+        return 1
+
+    b = Bas2C(fh, flag, cindent, inlinesize, incremental, maxerrors, diag,
+              re.sub(r'\.[cC]$', '', foname) if split and fo != sys.stdout else None)
+    r = b.start(fo, finame if finame else '<stdin>')
+    b.diagout('summary', errors=b.errcount, status=r)
+    if fh != sys.stdin:
+        fh.close()
+    if fo != sys.stdout:
+        fo.close()
+        # 変換に失敗した場合は --update で最新とみなされないように出力ファイルを消す
+        if r != 0:
+            import os
+            for f in [foname] + b.outfiles:
+                try:
+                    os.remove(f)
+                except OSError:
+                    pass
+    if finame and (depfile or manifest):
+        import os
+        try:
+            writedeps(finame, foname, depfile, manifest, b)
+        except OSError:
+            print(f'{sys.argv[0]}: cannot create dependency file')
+            return 1
+        # 変換に失敗した場合は次回必ず変換し直すように依存関係ファイルを消す
+        if r != 0 and depfile:
+            os.remove(depfile)
+    return r
+
+def reprocheck(finame, foname, args, seeds=('0', '1')):
+    """PYTHONHASHSEED を変えて2回変換し、出力が同じになることを確認する"""
+    import os
+    import subprocess
+    import tempfile
+    import difflib
+    if not finame:
+        usage()
+    base = os.path.basename(foname if foname and foname != '-' else outname(finame))
+    results = []
+    for seed in seeds:
+        wdir = tempfile.mkdtemp(prefix='bas2c')
+        env = dict(os.environ, PYTHONHASHSEED=seed)
+        p = subprocess.run([sys.executable, os.path.abspath(__file__), *args, os.path.abspath(finame),
+                            '-o', os.path.join(wdir, base)],
+                           stdout=subprocess.PIPE, stderr=subprocess.STDOUT, env=env, cwd=wdir)
+        files = {}
+        for f in sorted(os.listdir(wdir)):
+            with open(os.path.join(wdir, f), 'rb') as fh:
+                files[f] = fh.read()
+            os.remove(os.path.join(wdir, f))
+        os.rmdir(wdir)
+        results.append((p.returncode, p.stdout.replace(wdir.encode(), b''), files))
+
+    (r0, o0, f0), (r1, o1, f1) = results
+    differ = []
+    if r0 != r1:
+        differ.append(f'exit status: {r0} != {r1}')
+    if o0 != o1:
+        differ.append('messages')
+    for f in sorted(set(f0) | set(f1)):
+        if f0.get(f) != f1.get(f):
+            differ.append(f)
+            a = f0.get(f, b'').decode(errors='replace').splitlines()
+            b = f1.get(f, b'').decode(errors='replace').splitlines()
+            for l in list(difflib.unified_diff(a, b, f'{f} (PYTHONHASHSEED={seeds[0]})',
+                                              f'{f} (PYTHONHASHSEED={seeds[1]})', lineterm='', n=1))[:20]:
+                print('\t' + l)
+    if differ:
+        print(f'{finame:s}\t: error: PYTHONHASHSEED によって変換結果が変わります ({", ".join(differ)})')
+        return 1
+    print(f'{finame:s}\t: 変換結果は同じです ({", ".join(sorted(f0))})')
+    return 0
+
+def watch(wdir, focode, flag, cindent, inlinesize, maxerrors=0, diag=None, interval=0.05):
+    """ディレクトリ以下のBASICソースコードを監視して、変更されたものを変換する"""
+    import os
+    import time
+
+    def scan():
+        """BASICソースコードと bas2c.def の (更新時刻, サイズ) を得る"""
+        r = {}
+        for d, _, files in os.walk(wdir):
+            for f in files:
+                if f.endswith('.bas') or f.endswith('.BAS'):
+                    f = os.path.join(d, f)
+                    try:
+                        st = os.stat(f)
+                        r[f] = (st.st_mtime, st.st_size)
+                    except OSError:
+                        pass
+        try:
+            st = os.stat(defpath)
+            r[defpath] = (st.st_mtime, st.st_size)
+        except OSError:
+            pass
+        return r
+
+    def isstale(f):
+        """変換結果が存在しないか、ソースコードより古いかを調べる"""
+        try:
+            return os.stat(outname(f)).st_mtime < os.stat(f).st_mtime
+        except OSError:
+            return True
+
+    defpath = os.path.join(os.path.dirname(os.path.abspath(__file__)), 'bas2c.def')
+    readdef()
+    print(f'{sys.argv[0]}: watching {wdir}')
+    last = scan()
+    pending = set(f for f in last if f != defpath and isstale(f))
+    prev = last
+    while True:
+        cur = scan()
+        changed = set(f for f in cur if cur[f] != last.get(f))
+        last = cur
+        # 保存が続いている間は変換を待つ (前回の監視時から変化がなくなったら変換する)
+        ready = set(f for f in pending | changed if cur.get(f) == prev.get(f))
+        pending = (pending | changed) - ready
+        prev = cur
+        if defpath in ready:
+            ready.discard(defpath)
+            try:
+                readdef()
+                print(f'{sys.argv[0]}: reloaded {defpath}')
+            except Exception as e:
+                print(f'{sys.argv[0]}: cannot read {defpath}: {e}')
+            ready |= set(f for f in cur if f != defpath)
+        for f in sorted(ready):
+            if f not in cur:
+                continue
+            t = time.perf_counter()
+            r = convert(f, outname(f), focode, flag, cindent, inlinesize, maxerrors=maxerrors, diag=diag)
+            t = (time.perf_counter() - t) * 1000
+            print(f'{f:s} -> {outname(f):s} ({t:.0f} ms){"" if r == 0 else " error"}')
+        sys.stdout.flush()
+        time.sleep(interval)
+
 def usage():
-    print(f'usage: {sys.argv[0]} [-Dunbsv][-c[tabs]][-o output.c] input.bas')
+    print(f'usage: {sys.argv[0]} [-Dunbsvr][-O[opt,...]][--inline size][--profile-lines][--incremental cache][-c[tabs]]')
+    print(f'       [--max-errors n][--fail-fast][--pass1-stop][--diag file]')
+    print(f'       [--update][--depfile output.d][--manifest output.hdr][--split][-o output.c] input.bas')
+    print(f'       {sys.argv[0]} [options] --repro-check input.bas')
+    print(f'       {sys.argv[0]} [options] --watch dir')
     sys.exit(1)
 
 if __name__ == '__main__':
     flag = 0
     cindent = 0
+    inlinesize = 8
+    incremental = None
+    watchdir = None
+    maxerrors = 0
+    diagname = None
+    update = False
+    split = False
+    repro = False
+    depfile = None
+    manifest = None
     finame = None
     foname = None
     focode = 'utf-8'
@@ -1623,6 +3762,64 @@ if __name__ == '__main__':
                 flag |= Bas2C.BCCOMPAT
             elif sys.argv[i] == '-s':
                 focode = 'cp932'
+            elif sys.argv[i] == '-r':
+                flag |= Bas2C.REPORT
+            elif sys.argv[i] == '--profile-lines':
+                flag |= Bas2C.PROFILE
+            elif sys.argv[i] == '--max-errors':
+                i += 1
+                try:
+                    maxerrors = int(sys.argv[i])
+                except:
+                    usage()
+            elif sys.argv[i] == '--diag':
+                i += 1
+                if i >= len(sys.argv):
+                    usage()
+                diagname = sys.argv[i]
+            elif sys.argv[i] == '--fail-fast':
+                maxerrors = 1
+            elif sys.argv[i] == '--pass1-stop':
+                flag |= Bas2C.PASS1STOP
+            elif sys.argv[i] == '--update':
+                update = True
+            elif sys.argv[i] == '--split':
+                split = True
+            elif sys.argv[i] == '--repro-check':
+                repro = True
+            elif sys.argv[i] == '--depfile' or sys.argv[i] == '--manifest':
+                if i + 1 >= len(sys.argv):
+                    usage()
+                if sys.argv[i] == '--depfile':
+                    depfile = sys.argv[i + 1]
+                else:
+                    manifest = sys.argv[i + 1]
+                i += 1
+            elif sys.argv[i] == '--watch':
+                i += 1
+                if i >= len(sys.argv):
+                    usage()
+                watchdir = sys.argv[i]
+            elif sys.argv[i] == '--incremental':
+                i += 1
+                if i >= len(sys.argv):
+                    usage()
+                incremental = sys.argv[i]
+            elif sys.argv[i] == '--inline':
+                i += 1
+                try:
+                    inlinesize = int(sys.argv[i])
+                except:
+                    usage()
+                flag |= Bas2C.INLINE
+            elif sys.argv[i][1] == 'O':
+                if sys.argv[i] == '-O':
+                    flag |= Bas2C.OPTIMIZE
+                else:
+                    for o in sys.argv[i][2:].split(','):
+                        if o not in Bas2C.optnames:
+                            usage()
+                        flag |= Bas2C.optnames[o]
             elif sys.argv[i][1] == 'c':
                 flag |= Bas2C.BASCOMMENT
                 try:
@@ -1641,21 +3838,57 @@ if __name__ == '__main__':
                 foname = sys.argv[i]
         i += 1
 
-    if finame != None and foname == None:
-        foname = finame.replace('.bas','').replace('.BAS','') + '.c'
+    # エラー情報の出力先を開く ('-' なら標準エラー出力、'&n' ならファイルディスクリプタ n)
+    diag = None
+    if diagname:
+        try:
+            if diagname == '-':
+                diag = sys.stderr
+            elif diagname[0] == '&':
+                diag = open(int(diagname[1:]), 'w', encoding='utf-8', closefd=False)
+            else:
+                diag = open(diagname, 'w', encoding='utf-8')
+        except:
+            print(f'{sys.argv[0]}: cannot open diagnostics output {diagname}')
+            sys.exit(1)
+
+    if watchdir != None:
+        if finame or foname:
+            usage()
+        try:
+            watch(watchdir, focode, flag, cindent, inlinesize, maxerrors, diag)
+        except KeyboardInterrupt:
+            pass
+        sys.exit(0)
 
-    try:
-        fh = open(finame, 'r', encoding=fileencoding(finame)) if finame else sys.stdin
-    except:
-        print(f'{sys.argv[0]}: {finame} file not found')
-        sys.exit(1)
+    if finame != None and foname == None:
+        foname = outname(finame)
+    if split and (foname == None or foname == '-'):
+        usage()
+
+    # 変換結果に影響するオプションだけを渡して2回変換し、結果を比較する
+    if repro:
+        args = []
+        skip = { '--repro-check': 0, '--update': 0, '--depfile': 1, '--manifest': 1, '--diag': 1,
+                 '--incremental': 1, '-o': 1 }
+        i = 1
+        while i < len(sys.argv):
+            a = sys.argv[i]
+            if a in skip:
+                i += skip[a]
+            elif a in ('--max-errors', '--inline'):
+                args += sys.argv[i:i + 2]
+                i += 1
+            elif a[0] == '-':
+                args.append(a)
+            i += 1
+        sys.exit(reprocheck(finame, foname, args))
 
-    try:
-        fo = open(foname, 'w', encoding=focode) if foname and foname != '-' else sys.stdout
-    except:
-        print(f'{sys.argv[0]}: cannot create output file {foname}')
-        sys.exit(1)
+    # 出力ファイルが新しければ変換しない
+    if update and finame and foname != '-':
+        if uptodate(finame, foname, [f for f in (depfile, manifest) if f]):
+            sys.exit(0)
 
     readdef()
-    b = Bas2C(fh, flag, cindent)
-    sys.exit(b.start(fo, finame if finame else '<stdin>'))
+    sys.exit(convert(finame, foname, focode, flag, cindent, inlinesize, incremental, depfile, manifest, maxerrors, diag,
+                     split))
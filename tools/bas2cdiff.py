@@ -0,0 +1,172 @@
+#!/usr/bin/env python3
+#
+# Differential test harness for bas2c bas2cdiff.py
+# Copyright (c) 2024 Yuichi Nakamura (@yunkya2)
+#
+# The MIT License (MIT)
+#
+# Permission is hereby granted, free of charge, to any person obtaining a copy
+# of this software and associated documentation files (the "Software"), to deal
+# in the Software without restriction, including without limitation the rights
+# to use, copy, modify, merge, publish, distribute, sublicense, and/or sell
+# copies of the Software, and to permit persons to whom the Software is
+# furnished to do so, subject to the following conditions:
+#
+# The above copyright notice and this permission notice shall be included in
+# all copies or substantial portions of the Software.
+#
+# THE SOFTWARE IS PROVIDED "AS IS", WITHOUT WARRANTY OF ANY KIND, EXPRESS OR
+# IMPLIED, INCLUDING BUT NOT LIMITED TO THE WARRANTIES OF MERCHANTABILITY,
+# FITNESS FOR A PARTICULAR PURPOSE AND NONINFRINGEMENT. IN NO EVENT SHALL THE
+# AUTHORS OR COPYRIGHT HOLDERS BE LIABLE FOR ANY CLAIM, DAMAGES OR OTHER
+# LIABILITY, WHETHER IN AN ACTION OF CONTRACT, TORT OR OTHERWISE, ARISING FROM,
+# OUT OF OR IN CONNECTION WITH THE SOFTWARE OR THE USE OR OTHER DEALINGS IN
+# THE SOFTWARE.
+#
+import sys
+import os
+import re
+import subprocess
+import tempfile
+import shutil
+import time
+import difflib
+import concurrent.futures
+
+TOOLDIR = os.path.dirname(os.path.abspath(__file__))
+BAS2C = os.path.join(TOOLDIR, '..', 'bas2c.py')
+SRCDIR = os.path.join(TOOLDIR, '..', 'src')
+
+# C++版と共通のオプション
+OPTSETS = [[], ['-b'], ['-c'], ['-n'], ['-u'], ['-c3', '-b']]
+
+def fileencoding(fname):
+    """ファイルのエンコーディングを推測する"""
+    try:
+        with open(fname, 'r', encoding='utf-8') as f:
+            f.read()
+    except Exception as e:
+        return 'cp932'
+    return 'utf-8'
+
+def diagnostics(text):
+    """エラー出力から (行番号, 種類, メッセージ) のリストを得る"""
+    r = []
+    for l in text.decode('utf-8', errors='replace').splitlines():
+        if m := re.match(r'.*?:(\d+ \(\d+\))\s*: (error|warning): (.*)$', l):
+            r.append(f'{m.group(1)}: {m.group(2)}: {m.group(3).strip()}')
+    return r
+
+def run(args, cwd=None):
+    """コマンドを実行して、終了コードと出力、実行時間を得る"""
+    t = time.perf_counter()
+    p = subprocess.run(args, stdout=subprocess.PIPE, stderr=subprocess.PIPE, cwd=cwd)
+    return p.returncode, p.stdout + p.stderr, time.perf_counter() - t
+
+def compare(finame, opts, wdir, cxx):
+    """1つのファイルをPython版とC++版で変換して結果を比較する"""
+    name = os.path.splitext(os.path.basename(finame))[0]
+    tag = ''.join(c if c.isalnum() else '_' for c in ''.join(opts)) or 'default'
+    fpy = os.path.join(wdir, f'{name}.{tag}.py.c')
+    fcc = os.path.join(wdir, f'{name}.{tag}.cc.c')
+
+    # 入力がShift-JISならPython版の出力もShift-JISにする
+    pyopts = opts + (['-s'] if fileencoding(finame) == 'cp932' else [])
+    rpy, opy, tpy = run([sys.executable, BAS2C, *pyopts, finame, '-o', fpy])
+
+    # C++版は '/' で始まる引数をオプションとみなすので相対パスで指定し、
+    # bas2c.def を読むためにビルドディレクトリで実行する
+    cdir = os.path.dirname(cxx)
+    rcc, occ, tcc = run([cxx, *opts, os.path.relpath(finame, cdir), '-o', os.path.relpath(fcc, cdir)], cwd=cdir)
+
+    r = { 'file': finame, 'opts': ' '.join(opts), 'py': tpy, 'cc': tcc, 'diff': [] }
+    if rpy != rcc:
+        r['diff'].append(f'exit status: python={rpy} c++={rcc}')
+    dpy = diagnostics(opy)
+    dcc = diagnostics(occ)
+    if dpy != dcc:
+        r['diff'] += ['diagnostics:'] + list(difflib.unified_diff(dpy, dcc, 'python', 'c++', lineterm='', n=0))[2:]
+    if rpy != 0 and rcc != 0:
+        return r                # 変換に失敗した場合の出力 (Python版は消す) は比較しない
+    cpy = open(fpy, 'rb').read().decode('utf-8', errors='replace').splitlines() if os.path.exists(fpy) else []
+    ccc = open(fcc, 'rb').read().decode('utf-8', errors='replace').splitlines() if os.path.exists(fcc) else []
+    if cpy != ccc:
+        r['diff'] += ['C output:'] + list(difflib.unified_diff(cpy, ccc, 'python', 'c++', lineterm='', n=1))[2:]
+    return r
+
+def usage():
+    print(f'usage: {sys.argv[0]} [-j jobs] [-O "options"]... [--csv timing.csv] [--no-build] [-v] input.bas ...')
+    sys.exit(1)
+
+if __name__ == '__main__':
+    jobs = os.cpu_count() or 1
+    optsets = []
+    fcsv = None
+    build = True
+    verbose = False
+    files = []
+    i = 1
+    try:
+        while i < len(sys.argv):
+            a = sys.argv[i]
+            if a == '-j':
+                i += 1
+                jobs = int(sys.argv[i])
+            elif a == '-O':
+                i += 1
+                optsets.append(sys.argv[i].split())
+            elif a == '--csv':
+                i += 1
+                fcsv = sys.argv[i]
+            elif a == '--no-build':
+                build = False
+            elif a == '-v':
+                verbose = True
+            elif a[0] == '-':
+                usage()
+            else:
+                files.append(os.path.abspath(a))
+            i += 1
+    except (IndexError, ValueError):
+        usage()
+    if not files:
+        usage()
+    if not optsets:
+        optsets = OPTSETS
+
+    # 既存の src/Makefile でC++版をビルドする
+    if build:
+        p = subprocess.run(['make', '-C', SRCDIR, 'all'], stdout=subprocess.PIPE, stderr=subprocess.STDOUT)
+        if p.returncode != 0:
+            print(p.stdout.decode(errors='replace'), end='')
+            print(f'{sys.argv[0]}: cannot build C++ version')
+            sys.exit(1)
+    cxx = os.path.abspath(os.path.join(SRCDIR, 'bas2c'))
+    if not os.path.exists(cxx):
+        print(f'{sys.argv[0]}: {cxx} not found')
+        sys.exit(1)
+
+    wdir = tempfile.mkdtemp(prefix='bas2cdiff')
+    results = []
+    with concurrent.futures.ThreadPoolExecutor(max_workers=jobs) as ex:
+        fs = [ex.submit(compare, f, o, wdir, cxx) for f in files for o in optsets]
+        for f in fs:
+            r = f.result()
+            results.append(r)
+            st = 'same' if not r['diff'] else 'DIFFER'
+            print(f'{r["file"]:s} [{r["opts"] or "-"}]\tpython {r["py"]:.3f}s\tc++ {r["cc"]:.3f}s\t{st}')
+            if r['diff'] and verbose:
+                print(''.join('\t' + l + '\n' for l in r['diff']), end='')
+    shutil.rmtree(wdir, ignore_errors=True)
+
+    if fcsv:
+        with open(fcsv, 'w') as f:
+            f.write('file,options,python,cxx,result\n')
+            for r in results:
+                f.write(f'{r["file"]},{r["opts"]},{r["py"]:.6f},{r["cc"]:.6f},{"same" if not r["diff"] else "differ"}\n')
+
+    ndiff = len([r for r in results if r['diff']])
+    tpy = sum(r['py'] for r in results)
+    tcc = sum(r['cc'] for r in results)
+    print(f'{len(results)} conversions, {ndiff} differ, python {tpy:.3f}s, c++ {tcc:.3f}s')
+    sys.exit(1 if ndiff else 0)
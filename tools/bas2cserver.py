@@ -0,0 +1,272 @@
+#!/usr/bin/env python3
+#
+# Diagnostics server for editors bas2cserver.py
+# Copyright (c) 2024 Yuichi Nakamura (@yunkya2)
+#
+# The MIT License (MIT)
+#
+# Permission is hereby granted, free of charge, to any person obtaining a copy
+# of this software and associated documentation files (the "Software"), to deal
+# in the Software without restriction, including without limitation the rights
+# to use, copy, modify, merge, publish, distribute, sublicense, and/or sell
+# copies of the Software, and to permit persons to whom the Software is
+# furnished to do so, subject to the following conditions:
+#
+# The above copyright notice and this permission notice shall be included in
+# all copies or substantial portions of the Software.
+#
+# THE SOFTWARE IS PROVIDED "AS IS", WITHOUT WARRANTY OF ANY KIND, EXPRESS OR
+# IMPLIED, INCLUDING BUT NOT LIMITED TO THE WARRANTIES OF MERCHANTABILITY,
+# FITNESS FOR A PARTICULAR PURPOSE AND NONINFRINGEMENT. IN NO EVENT SHALL THE
+# AUTHORS OR COPYRIGHT HOLDERS BE LIABLE FOR ANY CLAIM, DAMAGES OR OTHER
+# LIABILITY, WHETHER IN AN ACTION OF CONTRACT, TORT OR OTHERWISE, ARISING FROM,
+# OUT OF OR IN CONNECTION WITH THE SOFTWARE OR THE USE OR OTHER DEALINGS IN
+# THE SOFTWARE.
+#
+import sys
+import os
+import io
+import json
+import time
+import asyncio
+import contextlib
+import concurrent.futures
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), '..'))
+import bas2c
+from bas2c import Bas2C, BasTokenGen, BasToken, BasKeyword, BasVariable
+
+DEBOUNCE = 0.03         # 編集が続いている間は解析を待つ時間 (秒)
+BUDGET = 100            # 解析結果を待つ時間のデフォルト (ms)
+
+class BasDocument:
+    """エディタで編集中のBASICソースコード1つ分を保持するクラス"""
+    def __init__(self, uri, text):
+        self.uri = uri
+        self.version = 0
+        self.lines = []
+        self.jumps = []         # 行ごとの GOTO/GOSUB 飛び先 (編集された行だけを字句解析し直す)
+        self.cache = {}         # 領域ごとの変換結果 (Bas2C のインクリメンタル変換で使う)
+        self.result = None      # 最後に解析した結果
+        self.task = None        # 実行中または実行待ちの解析
+        self.replace(0, 0, text)
+
+    @staticmethod
+    def lex(line):
+        """1行分を字句解析して、GOTO/GOSUB の飛び先の行番号を得る"""
+        t = BasTokenGen(io.StringIO(line))
+        r = []
+        prev = None
+        while True:
+            x = t.get()
+            if x.iskeyword(BasKeyword.EOF) or x.iskeyword(BasKeyword.EOL):
+                break
+            if x.istype(BasToken.INT) and prev and \
+               (prev.iskeyword(BasKeyword.GOTO) or prev.iskeyword(BasKeyword.GOSUB)):
+                kind = 'goto' if prev.iskeyword(BasKeyword.GOTO) else 'gosub'
+                r.append([kind, int(x.value)])
+            prev = x
+        return r
+
+    def replace(self, start, end, text):
+        """[start, end) 行目を text で置き換える"""
+        new = text.splitlines(True)
+        if new and not new[-1].endswith('\n'):
+            new[-1] += '\n'
+        self.lines[start:end] = new
+        self.jumps[start:end] = [self.lex(l) for l in new]
+        self.version += 1
+
+    def analyze(self, flag):
+        """変換処理を行ってエラーとシンボル、飛び先の情報を得る (別スレッドで実行する)"""
+        t0 = time.perf_counter()
+        diag = io.StringIO()
+        b = Bas2C(io.StringIO(''.join(self.lines)), flag, incremental=self.cache, diag=diag)
+        with contextlib.redirect_stdout(io.StringIO()):
+            b.start(io.StringIO(), self.uri)
+
+        diagnostics = []
+        for l in diag.getvalue().splitlines():
+            d = json.loads(l)
+            if d['level'] == 'error' and 'line' in d:
+                diagnostics.append({ 'line': d['line'], 'column': d['column'], 'severity': 'error',
+                                     'message': d['message'] })
+
+        # グローバル/ローカル名前空間のシンボル一覧
+        def symbols(ls):
+            return [{ 'name': v.name, 'type': BasKeyword.getkeyword(v.type % BasVariable.DIM), 'arg': v.arg,
+                      'kind': 'function' if v.func else 'array' if v.isarray() else 'variable' }
+                    for v in ls.values() if v.type < BasVariable.STATICCONST]
+        locals = { k: symbols(v) for k, v in b.nsp.llist.items() }
+
+        # GOTO/GOSUB の飛び先 (字句解析の結果と pass 1 で得た行番号の対応から求める)
+        jumps = []
+        for i, js in enumerate(self.jumps):
+            for kind, l in js:
+                to = b.linemap.get(l)
+                jumps.append({ 'line': i + 1, 'kind': kind, 'target': l, 'targetline': to })
+                if to == None:
+                    diagnostics.append({ 'line': i + 1, 'column': 0, 'severity': 'warning',
+                                         'message': f'行番号 {l} がありません' })
+        diagnostics.sort(key=lambda d: d['line'])
+        return { 'uri': self.uri, 'diagnostics': diagnostics,
+                 'symbols': symbols(b.nsp.glist), 'locals': locals, 'jumps': jumps,
+                 'time': round((time.perf_counter() - t0) * 1000, 3) }
+
+class BasServer:
+    """JSONで書かれた要求を1行ずつ受け取って応答を返すサーバ"""
+    def __init__(self, flag=0):
+        self.flag = flag
+        self.docs = {}
+        # 変換処理は Bas2C のクラス変数を使うので、スレッド1つで順に実行する
+        self.executor = concurrent.futures.ThreadPoolExecutor(max_workers=1)
+        self.writers = set()
+
+    async def run_analysis(self, doc, version):
+        """少し待ってから解析を行う (その間に編集されたらキャンセルされる)"""
+        await asyncio.sleep(DEBOUNCE)
+        r = await asyncio.get_running_loop().run_in_executor(self.executor, doc.analyze, self.flag)
+        r['version'] = version
+        if version == doc.version:
+            doc.result = r
+        return r
+
+    def schedule(self, doc):
+        """最新の版の解析を開始する (実行待ちの古い解析はキャンセルする)"""
+        if doc.task and not doc.task.done():
+            if doc.task.version == doc.version:
+                return doc.task
+            doc.task.cancel()
+        doc.task = asyncio.ensure_future(self.run_analysis(doc, doc.version))
+        doc.task.version = doc.version
+        doc.task.add_done_callback(lambda t: self.publish(doc, t))
+        return doc.task
+
+    def publish(self, doc, task):
+        """解析が終わったら結果をエディタに通知する"""
+        if task.cancelled() or task.exception() or task.result()['version'] != doc.version:
+            return
+        for w in self.writers:
+            self.send(w, { 'method': 'diagnostics', 'params': task.result() })
+
+    def send(self, writer, msg):
+        writer.write((json.dumps(msg, ensure_ascii=False) + '\n').encode('utf-8'))
+
+    async def request(self, req):
+        """要求を1つ処理して結果を返す"""
+        method = req.get('method')
+        p = req.get('params', {})
+        uri = p.get('uri')
+        if method == 'open':
+            doc = self.docs[uri] = BasDocument(uri, p.get('text', ''))
+            self.schedule(doc)
+            return { 'version': doc.version }
+        if method == 'shutdown':
+            raise EOFError
+        doc = self.docs.get(uri)
+        if doc == None:
+            raise KeyError(f'{uri} is not opened')
+        if method == 'change':
+            # 行単位の差分 [{"start":, "end":, "text":}] か、全体の "text" で更新する
+            if 'text' in p:
+                doc.replace(0, len(doc.lines), p['text'])
+            for c in p.get('changes', []):
+                doc.replace(c['start'], c['end'], c['text'])
+            self.schedule(doc)
+            return { 'version': doc.version }
+        if method == 'diagnostics':
+            if doc.result and doc.result['version'] == doc.version:
+                return dict(doc.result, stale=False)
+            task = self.schedule(doc)
+            try:
+                r = await asyncio.wait_for(asyncio.shield(task), p.get('budget', BUDGET) / 1000)
+                return dict(r, stale=False)
+            except (asyncio.TimeoutError, asyncio.CancelledError):
+                # 間に合わないか、待っている間に編集された場合は前回の結果を返す
+                # (最新の結果は解析が終わったときに通知される)
+                return dict(doc.result or { 'uri': uri, 'diagnostics': [], 'symbols': [], 'locals': {},
+                                            'jumps': [], 'version': 0 }, stale=True)
+        if method == 'close':
+            if doc.task:
+                doc.task.cancel()
+            del self.docs[uri]
+            return {}
+        raise KeyError(f'unknown method {method}')
+
+    async def respond(self, writer, req):
+        """要求を処理して応答を返す"""
+        try:
+            r = { 'id': req.get('id'), 'result': await self.request(req) }
+        except EOFError:
+            raise
+        except Exception as e:
+            r = { 'id': req.get('id'), 'error': str(e) }
+        self.send(writer, r)
+
+    async def serve(self, reader, writer):
+        """1つの接続からの要求を処理する"""
+        self.writers.add(writer)
+        try:
+            while line := await reader.readline():
+                try:
+                    req = json.loads(line)
+                except ValueError:
+                    continue
+                if req.get('method') == 'diagnostics':
+                    # 解析結果を待つ間も後続の編集を受け付ける
+                    asyncio.ensure_future(self.respond(writer, req))
+                    continue
+                try:
+                    await self.respond(writer, req)
+                except EOFError:
+                    break
+                await writer.drain()
+        finally:
+            self.writers.discard(writer)
+            writer.close()
+
+async def stdio(server):
+    """標準入出力で要求を受け付ける"""
+    loop = asyncio.get_running_loop()
+    reader = asyncio.StreamReader()
+    await loop.connect_read_pipe(lambda: asyncio.StreamReaderProtocol(reader), sys.stdin)
+    tr, pr = await loop.connect_write_pipe(asyncio.streams.FlowControlMixin, os.fdopen(sys.stdout.fileno(), 'wb'))
+    writer = asyncio.StreamWriter(tr, pr, reader, loop)
+    await server.serve(reader, writer)
+
+async def tcp(server, port):
+    """TCPで要求を受け付ける"""
+    s = await asyncio.start_server(server.serve, '127.0.0.1', port)
+    async with s:
+        await s.serve_forever()
+
+def usage():
+    print(f'usage: {sys.argv[0]} [-u][-b][--port port]')
+    sys.exit(1)
+
+if __name__ == '__main__':
+    flag = 0
+    port = None
+    i = 1
+    try:
+        while i < len(sys.argv):
+            a = sys.argv[i]
+            if a == '-u':
+                flag |= Bas2C.UNDEFERR
+            elif a == '-b':
+                flag |= Bas2C.BCCOMPAT
+            elif a == '--port':
+                i += 1
+                port = int(sys.argv[i])
+            else:
+                usage()
+            i += 1
+    except (IndexError, ValueError):
+        usage()
+
+    bas2c.readdef()
+    server = BasServer(flag)
+    try:
+        asyncio.run(tcp(server, port) if port else stdio(server))
+    except KeyboardInterrupt:
+        pass
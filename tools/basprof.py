@@ -0,0 +1,113 @@
+#!/usr/bin/env python3
+#
+# BASIC line profile viewer basprof.py
+# Copyright (c) 2024 Yuichi Nakamura (@yunkya2)
+#
+# The MIT License (MIT)
+#
+# Permission is hereby granted, free of charge, to any person obtaining a copy
+# of this software and associated documentation files (the "Software"), to deal
+# in the Software without restriction, including without limitation the rights
+# to use, copy, modify, merge, publish, distribute, sublicense, and/or sell
+# copies of the Software, and to permit persons to whom the Software is
+# furnished to do so, subject to the following conditions:
+#
+# The above copyright notice and this permission notice shall be included in
+# all copies or substantial portions of the Software.
+#
+# THE SOFTWARE IS PROVIDED "AS IS", WITHOUT WARRANTY OF ANY KIND, EXPRESS OR
+# IMPLIED, INCLUDING BUT NOT LIMITED TO THE WARRANTIES OF MERCHANTABILITY,
+# FITNESS FOR A PARTICULAR PURPOSE AND NONINFRINGEMENT. IN NO EVENT SHALL THE
+# AUTHORS OR COPYRIGHT HOLDERS BE LIABLE FOR ANY CLAIM, DAMAGES OR OTHER
+# LIABILITY, WHETHER IN AN ACTION OF CONTRACT, TORT OR OTHERWISE, ARISING FROM,
+# OUT OF OR IN CONNECTION WITH THE SOFTWARE OR THE USE OR OTHER DEALINGS IN
+# THE SOFTWARE.
+#
+
+import sys
+import os
+
+def fileencoding(fname):
+    """ファイルのエンコーディングを推測する"""
+    try:
+        with open(fname, 'r', encoding='utf-8') as f:
+            f.read()
+    except Exception as e:
+        return 'cp932'
+    return 'utf-8'
+
+def readprof(fname):
+    """プロファイル結果を読み込んで、ソースファイル名と {行番号: 実行回数} を得る"""
+    src = None
+    count = {}
+    with open(fname, 'r') as f:
+        for l in f:
+            if l.startswith('#'):
+                src = l[1:].strip()
+                continue
+            a = l.split()
+            if len(a) == 2:
+                count[int(a[0])] = count.get(int(a[0]), 0) + int(a[1])
+    return src, count
+
+def usage():
+    print(f'usage: {sys.argv[0]} [-a][-n lines] profile.prf [input.bas]')
+    sys.exit(1)
+
+if __name__ == '__main__':
+    annotate = False
+    top = 20
+    fprof = None
+    finame = None
+    i = 1
+    while i < len(sys.argv):
+        if sys.argv[i][0] == '-':
+            if sys.argv[i] == '-a':
+                annotate = True
+            elif sys.argv[i] == '-n':
+                i += 1
+                try:
+                    top = int(sys.argv[i])
+                except:
+                    usage()
+            else:
+                usage()
+        else:
+            if not fprof:
+                fprof = sys.argv[i]
+            elif not finame:
+                finame = sys.argv[i]
+        i += 1
+    if not fprof:
+        usage()
+
+    try:
+        src, count = readprof(fprof)
+    except:
+        print(f'{sys.argv[0]}: cannot read profile {fprof}')
+        sys.exit(1)
+
+    # ソースファイルが指定されていなければプロファイル結果に記録された名前を使う
+    if not finame:
+        finame = src
+        if finame and not os.path.exists(finame):
+            finame = os.path.join(os.path.dirname(fprof), os.path.basename(finame))
+    try:
+        with open(finame, 'r', encoding=fileencoding(finame)) as f:
+            lines = [l.rstrip('\r\n\x1a') for l in f]
+    except:
+        print(f'{sys.argv[0]}: {finame} file not found')
+        sys.exit(1)
+
+    total = sum(count.values())
+    if annotate:
+        # ソースコード全体に実行回数を付けて表示する
+        for n, l in enumerate(lines, 1):
+            c = f'{count[n]:10d}' if n in count else ' ' * 10
+            print(f'{c} | {l}')
+    else:
+        # 実行回数の多い行から順に表示する
+        print(f'{"count":>10s} {"%":>6s} {"line":>6s} | source')
+        for n, c in sorted(count.items(), key=lambda x: (-x[1], x[0]))[:top]:
+            l = lines[n - 1] if n <= len(lines) else ''
+            print(f'{c:10d} {c * 100 / total if total else 0:6.2f} {n:6d} | {l}')
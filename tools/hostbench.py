@@ -0,0 +1,227 @@
+#!/usr/bin/env python3
+#
+# Host benchmark harness for bas2c hostbench.py
+# Copyright (c) 2024 Yuichi Nakamura (@yunkya2)
+#
+# The MIT License (MIT)
+#
+# Permission is hereby granted, free of charge, to any person obtaining a copy
+# of this software and associated documentation files (the "Software"), to deal
+# in the Software without restriction, including without limitation the rights
+# to use, copy, modify, merge, publish, distribute, sublicense, and/or sell
+# copies of the Software, and to permit persons to whom the Software is
+# furnished to do so, subject to the following conditions:
+#
+# The above copyright notice and this permission notice shall be included in
+# all copies or substantial portions of the Software.
+#
+# THE SOFTWARE IS PROVIDED "AS IS", WITHOUT WARRANTY OF ANY KIND, EXPRESS OR
+# IMPLIED, INCLUDING BUT NOT LIMITED TO THE WARRANTIES OF MERCHANTABILITY,
+# FITNESS FOR A PARTICULAR PURPOSE AND NONINFRINGEMENT. IN NO EVENT SHALL THE
+# AUTHORS OR COPYRIGHT HOLDERS BE LIABLE FOR ANY CLAIM, DAMAGES OR OTHER
+# LIABILITY, WHETHER IN AN ACTION OF CONTRACT, TORT OR OTHERWISE, ARISING FROM,
+# OUT OF OR IN CONNECTION WITH THE SOFTWARE OR THE USE OR OTHER DEALINGS IN
+# THE SOFTWARE.
+#
+import sys
+import os
+import shutil
+import subprocess
+import tempfile
+import time
+import hashlib
+import glob
+
+import hostgen
+
+TOOLDIR = os.path.dirname(os.path.abspath(__file__))
+BAS2C = os.path.join(TOOLDIR, '..', 'bas2c.py')
+HOSTLIB = os.path.join(TOOLDIR, 'hostlib')
+
+def eachopt():
+    """最適化なしと、-O<最適化名> でそれぞれの最適化だけを行うオプション、-O のリストを得る"""
+    sys.path.insert(0, os.path.join(TOOLDIR, '..'))
+    import bas2c
+    return [[]] + [[f'-O{n}'] for n in bas2c.Bas2C.optnames] + [['-O']]
+
+class HostBench:
+    """変換したプログラムをホスト環境でコンパイルして実行時間を測定するクラス"""
+    def __init__(self, wdir, cc='gcc', cflags='-O2', runs=3, stdin=None, timeout=60, stubs=False):
+        self.wdir = wdir
+        self.cc = cc
+        self.cflags = cflags.split()
+        self.runs = runs
+        self.stdin = stdin
+        self.timeout = timeout
+        self.stubs = stubs
+        self.gdir = os.path.join(wdir, 'hostlib')
+        self.objs = []
+
+    def cmd(self, args, **kw):
+        """コマンドを実行して、終了コードと出力、実行時間を得る"""
+        t = time.perf_counter()
+        try:
+            r = subprocess.run(args, stdout=subprocess.PIPE, stderr=subprocess.PIPE, **kw)
+        except subprocess.TimeoutExpired:
+            return -1, b'', b'timeout', time.perf_counter() - t
+        return r.returncode, r.stdout, r.stderr, time.perf_counter() - t
+
+    def prepare(self):
+        """bas2c.def からヘッダファイルとスタブ関数を生成し、ランタイムをコンパイルする"""
+        hostgen.generate(os.path.join(TOOLDIR, '..', 'bas2c.def'), self.gdir,
+                         os.path.join(HOSTLIB, 'hostlib.c'))
+        for src in (os.path.join(HOSTLIB, 'hostlib.c'), os.path.join(self.gdir, 'hoststub.c')):
+            obj = os.path.join(self.gdir, os.path.basename(src).replace('.c', '.o'))
+            rc, _, err, _ = self.cmd([self.cc, '-std=gnu89', '-w', *self.cflags,
+                                      '-I', HOSTLIB, '-I', self.gdir, '-c', src, '-o', obj])
+            if rc != 0:
+                print(err.decode(errors='replace'), file=sys.stderr)
+                raise RuntimeError(f'cannot compile {src}')
+            self.objs.append(obj)
+
+    def bench(self, finame, opts):
+        """BASICソースコードを変換、コンパイルして実行し、結果を辞書で返す"""
+        name = os.path.splitext(os.path.basename(finame))[0]
+        tag = ''.join(c if c.isalnum() else '_' for c in ' '.join(opts)) or 'default'
+        # --split で出力されるファイルや --incremental のキャッシュはファイルとオプションごとのディレクトリに置く
+        odir = os.path.join(self.wdir, f'{name}.{tag}')
+        os.makedirs(odir, exist_ok=True)
+        base = os.path.join(odir, name)
+        r = { 'file': finame, 'opts': ' '.join(opts), 'status': 'ok',
+              'conv': 0.0, 'compile': 0.0, 'best': None, 'mean': None, 'output': '', 'stubs': '' }
+
+        # bas2c.py で C ソースコードに変換する
+        rc, out, err, r['conv'] = self.cmd([sys.executable, BAS2C, *opts, finame, '-o', base + '.c'], cwd=odir)
+        if rc != 0:
+            r['status'] = 'convert error'
+            r['message'] = (out + err).decode(errors='replace')
+            return r
+
+        # ホスト環境のコンパイラでコンパイルする
+        rc, out, err, r['compile'] = self.cmd([self.cc, '-std=gnu89', '-w', *self.cflags,
+                                               '-I', HOSTLIB, '-I', self.gdir,
+                                               base + '.c', *sorted(glob.glob(base + '_*.c')),
+                                               *self.objs, '-o', base, '-lm'])
+        if rc != 0:
+            r['status'] = 'compile error'
+            r['message'] = err.decode(errors='replace')
+            return r
+
+        # 実行時間を測定する (出力は最初の実行結果を記録する)
+        env = dict(os.environ)
+        if self.stubs:
+            env['BAS2C_HOSTSTUB'] = '1'
+        times = []
+        for i in range(self.runs):
+            with open(self.stdin if self.stdin else os.devnull, 'rb') as fi:
+                rc, out, err, t = self.cmd([base], stdin=fi, cwd=self.wdir, env=env, timeout=self.timeout)
+            if rc < 0:
+                r['status'] = 'timeout' if err == b'timeout' else f'signal {-rc}'
+                return r
+            if i == 0:
+                r['output'] = hashlib.sha1(out).hexdigest()[:12]
+                r['stubs'] = err.decode(errors='replace') if self.stubs else ''
+                with open(base + '.out', 'wb') as fo:
+                    fo.write(out)
+            times.append(t)
+        r['best'] = min(times)
+        r['mean'] = sum(times) / len(times)
+        return r
+
+def usage():
+    print(f'usage: {sys.argv[0]} [-O "bas2c options"]...[--each-opt] [-n runs] [-i stdin] [-t timeout] [-s][-k]'
+          ' [--cc cc] [--cflags flags] [-w workdir] input.bas ...')
+    sys.exit(1)
+
+if __name__ == '__main__':
+    optsets = []
+    runs = 3
+    stdin = None
+    timeout = 60
+    stubs = False
+    keep = False
+    cc = 'gcc'
+    cflags = '-O2'
+    wdir = None
+    files = []
+    i = 1
+    try:
+        while i < len(sys.argv):
+            a = sys.argv[i]
+            if a == '-O':
+                i += 1
+                optsets.append(sys.argv[i].split())
+            elif a == '--each-opt':
+                optsets += eachopt()
+            elif a == '-n':
+                i += 1
+                runs = int(sys.argv[i])
+            elif a == '-i':
+                i += 1
+                stdin = os.path.abspath(sys.argv[i])
+            elif a == '-t':
+                i += 1
+                timeout = float(sys.argv[i])
+            elif a == '-s':
+                stubs = True
+            elif a == '-k':
+                keep = True
+            elif a == '--cc':
+                i += 1
+                cc = sys.argv[i]
+            elif a == '--cflags':
+                i += 1
+                cflags = sys.argv[i]
+            elif a == '-w':
+                i += 1
+                wdir = sys.argv[i]
+                keep = True
+            elif a[0] == '-':
+                usage()
+            else:
+                files.append(a)
+            i += 1
+    except (IndexError, ValueError):
+        usage()
+    if not files:
+        usage()
+    if not optsets:
+        optsets = [[], ['-O']]      # 最適化なし/ありの比較をデフォルトとする
+
+    if wdir:
+        os.makedirs(wdir, exist_ok=True)
+    else:
+        wdir = tempfile.mkdtemp(prefix='hostbench')
+    hb = HostBench(os.path.abspath(wdir), cc, cflags, runs, stdin, timeout, stubs)
+    try:
+        hb.prepare()
+    except RuntimeError as e:
+        print(f'{sys.argv[0]}: {e}')
+        sys.exit(1)
+
+    failed = False
+    print(f'{"file":24s} {"options":16s} {"conv":>7s} {"cc":>7s} {"best":>9s} {"mean":>9s}  {"output":12s}  status')
+    for f in files:
+        outputs = set()
+        for opts in optsets:
+            r = hb.bench(os.path.abspath(f), opts)
+            best = f'{r["best"]:9.4f}' if r['best'] is not None else ' ' * 9
+            mean = f'{r["mean"]:9.4f}' if r['mean'] is not None else ' ' * 9
+            print(f'{f:24s} {r["opts"] or "-":16s} {r["conv"]:7.3f} {r["compile"]:7.3f} {best} {mean}  '
+                  f'{r["output"]:12s}  {r["status"]}')
+            if r['status'] != 'ok':
+                failed = True
+                if 'message' in r:
+                    print(r['message'], end='')
+            else:
+                outputs.add(r['output'])
+            if r['stubs']:
+                print(''.join('\t' + l + '\n' for l in r['stubs'].splitlines()), end='')
+        # オプションによって実行結果が変わっていたら失敗とする
+        if len(outputs) > 1:
+            print(f'{f}: output differs between option sets')
+            failed = True
+
+    if not keep:
+        shutil.rmtree(wdir, ignore_errors=True)
+    sys.exit(1 if failed else 0)
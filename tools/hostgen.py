@@ -0,0 +1,171 @@
+#!/usr/bin/env python3
+#
+# Host runtime generator for bas2c hostgen.py
+# Copyright (c) 2024 Yuichi Nakamura (@yunkya2)
+#
+# The MIT License (MIT)
+#
+# Permission is hereby granted, free of charge, to any person obtaining a copy
+# of this software and associated documentation files (the "Software"), to deal
+# in the Software without restriction, including without limitation the rights
+# to use, copy, modify, merge, publish, distribute, sublicense, and/or sell
+# copies of the Software, and to permit persons to whom the Software is
+# furnished to do so, subject to the following conditions:
+#
+# The above copyright notice and this permission notice shall be included in
+# all copies or substantial portions of the Software.
+#
+# THE SOFTWARE IS PROVIDED "AS IS", WITHOUT WARRANTY OF ANY KIND, EXPRESS OR
+# IMPLIED, INCLUDING BUT NOT LIMITED TO THE WARRANTIES OF MERCHANTABILITY,
+# FITNESS FOR A PARTICULAR PURPOSE AND NONINFRINGEMENT. IN NO EVENT SHALL THE
+# AUTHORS OR COPYRIGHT HOLDERS BE LIABLE FOR ANY CLAIM, DAMAGES OR OTHER
+# LIABILITY, WHETHER IN AN ACTION OF CONTRACT, TORT OR OTHERWISE, ARISING FROM,
+# OUT OF OR IN CONNECTION WITH THE SOFTWARE OR THE USE OR OTHER DEALINGS IN
+# THE SOFTWARE.
+#
+import sys
+import os
+import re
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), '..'))
+from bas2c import BasKeyword
+
+# ホストのCライブラリにあるものをそのまま使う関数
+LIBC = { 'abs', 'atof', 'atoi', 'atan', 'cos', 'exp', 'log', 'pow', 'sin', 'tan', 'sqrt',
+         'rand', 'srand', 'strlen', 'strcspn', 'strspn', 'toascii', 'tolower', 'toupper',
+         'isalnum', 'isalpha', 'isascii', 'iscntrl', 'isdigit', 'isgraph', 'islower',
+         'isprint', 'ispunct', 'isspace', 'isupper', 'isxdigit', 'ecvt', 'fcvt', 'gcvt' }
+
+CTYPE = { 'I': 'int', 'C': 'int', 'F': 'double', 'S': 'unsigned char *' }
+
+def prototype(ex):
+    """組込/外部関数定義からC関数名と戻り値型、引数型のリストを得る"""
+    # X-BASIC引数の型
+    av = []
+    for m in re.finditer(r'([ISCFN])(A?)', ex.arg):
+        if m.group(2):
+            av.append('unsigned char *' if m.group(1) == 'C' else 'void *')
+        else:
+            av.append(CTYPE.get(m.group(1), 'int'))
+    # C引数の型
+    args = []
+    i = 0
+    for a in ex.carg.split(','):
+        if a == '':
+            continue
+        if a in ('#', '@'):                 # 引数のサイズ
+            args.append('int')
+        elif a == '&':                      # 引数へのポインタ
+            args.append((av[i] if i < len(av) else 'int') + ' *')
+            i += 1
+        elif a == '%':
+            args.append(av[i] if i < len(av) else 'int')
+            i += 1
+        elif a == '$':                      # 文字列作業用ワーク
+            args.append('unsigned char *')
+    return ex.cfunc if ex.cfunc else ex.name, CTYPE.get(ex.type, 'void'), args
+
+def cdecl(ty, name, args):
+    """関数の宣言を得る"""
+    a = [f'{t}{"" if t.endswith("*") else " "}a{i}' for i, t in enumerate(args)]
+    return f'{ty}{"" if ty.endswith("*") else " "}{name}({", ".join(a) if a else "void"})'
+
+def implemented(src):
+    """ホスト用ランタイムのソースコードで定義されている関数名を得る"""
+    with open(src) as f:
+        return set(re.findall(r'^[A-Za-z_][\w \t*]*?\b(\w+)\([^;\n]*$', f.read(), re.MULTILINE))
+
+def generate(fdef, odir, hostlib=None):
+    """bas2c.def から関数グループごとのヘッダファイルとスタブ関数を生成する"""
+    with open(fdef) as f:
+        BasKeyword.exfninit(f)
+    impl = implemented(hostlib) if hostlib else set()
+
+    groups = {}
+    done = set()
+    for ex in BasKeyword.exfnlist.values():
+        name, ty, args = prototype(ex)
+        if name in done or name in LIBC:
+            continue
+        done.add(name)
+        groups.setdefault(ex.group, []).append((name, ty, args))
+
+    os.makedirs(odir, exist_ok=True)
+    stubs = []
+    for g, fl in groups.items():
+        hname = f'{g.lower()}.h' if g else 'basic0def.h'
+        guard = '_' + hname.replace('.', '_').upper() + '_'
+        with open(os.path.join(odir, hname), 'w') as f:
+            f.write(f'/* {hname} - generated from bas2c.def by hostgen.py */\n\n')
+            f.write(f'#ifndef {guard}\n#define {guard}\n\n')
+            if g:
+                f.write('#include <basic0.h>\n\n')
+            for name, ty, args in fl:
+                f.write(cdecl(ty, name, args) + ';\n')
+                if name not in impl:
+                    stubs.append((name, ty, args))
+            f.write(f'\n#endif /* {guard} */\n')
+
+    # ホスト用ランタイムにない関数は、呼び出し回数を数えるだけのスタブにする
+    with open(os.path.join(odir, 'hoststub.c'), 'w') as f:
+        f.write('/* hoststub.c - generated from bas2c.def by hostgen.py */\n\n')
+        f.write('#include <basic0.h>\n')
+        for g in groups:
+            if g:
+                f.write(f'#include <{g.lower()}.h>\n')
+        f.write('\nstatic const char *stubname[] = {\n')
+        for name, ty, args in stubs:
+            f.write(f'\t"{name}",\n')
+        f.write('};\n')
+        f.write(f'static unsigned long stubcount[{max(len(stubs), 1)}];\n\n')
+        f.write('static void hoststub_dump(void)\n{\n'
+                '\tint i;\n\n'
+                '\tif (getenv("BAS2C_HOSTSTUB") == NULL)\n\t\treturn;\n'
+                f'\tfor (i = 0; i < {len(stubs)}; i++)\n'
+                '\t\tif (stubcount[i])\n'
+                '\t\t\tfprintf(stderr, "%s\\t%lu\\n", stubname[i], stubcount[i]);\n}\n\n')
+        f.write('void hoststub_hit(int n)\n{\n'
+                '\tstatic int registered = 0;\n\n'
+                '\tif (!registered) {\n\t\tatexit(hoststub_dump);\n\t\tregistered = 1;\n\t}\n'
+                '\tstubcount[n]++;\n}\n')
+        for i, (name, ty, args) in enumerate(stubs):
+            f.write('\n' + cdecl(ty, name, args) + '\n{\n')
+            f.write(f'\thoststub_hit({i});\n')
+            if ty == 'unsigned char *':
+                if args and args[0] == 'unsigned char *':
+                    f.write('\ta0[0] = \'\\0\';\n\treturn a0;\n')
+                else:
+                    f.write('\treturn (unsigned char *)"";\n')
+            elif ty == 'double':
+                f.write('\treturn 0.0;\n')
+            elif ty != 'void':
+                f.write('\treturn 0;\n')
+            f.write('}\n')
+    return len(stubs)
+
+def usage():
+    print(f'usage: {sys.argv[0]} [-d bas2c.def] [-l hostlib.c] outdir')
+    sys.exit(1)
+
+if __name__ == '__main__':
+    tdir = os.path.dirname(os.path.abspath(__file__))
+    fdef = os.path.join(tdir, '..', 'bas2c.def')
+    hostlib = os.path.join(tdir, 'hostlib', 'hostlib.c')
+    odir = None
+    i = 1
+    while i < len(sys.argv):
+        if sys.argv[i] == '-d':
+            i += 1
+            fdef = sys.argv[i]
+        elif sys.argv[i] == '-l':
+            i += 1
+            hostlib = sys.argv[i]
+        elif sys.argv[i][0] == '-' or odir:
+            usage()
+        else:
+            odir = sys.argv[i]
+        i += 1
+    if not odir:
+        usage()
+    n = generate(fdef, odir, hostlib)
+    print(f'{odir}: {n} stub functions generated')
@@ -0,0 +1,54 @@
+/*
+ * basic0.h - bas2c ホスト環境用ランタイム
+ *
+ * bas2c で変換した C ソースコードを Linux などのホスト環境でコンパイルするための
+ * X-BASIC ランタイム (libbas) の代替ヘッダファイルです。
+ * 関数グループごとのヘッダファイル (basic.h, graph.h ...) は tools/hostgen.py で
+ * bas2c.def から生成します。
+ */
+
+#ifndef _BASIC0_H_
+#define _BASIC0_H_
+
+#include <stdio.h>
+#include <stdlib.h>
+#include <string.h>
+#include <ctype.h>
+#include <math.h>
+
+#define STRCRLF     ((unsigned char *)"\r\n")
+#define STRTAB      ((unsigned char *)"\t")
+
+/* プログラムの開始/終了 */
+void b_init(void);
+void b_exit(int status);
+
+/* print/input */
+void b_sprint(unsigned char *s);
+void b_iprint(int v);
+void b_fprint(double v);
+void b_tprint(int n);
+void b_slprint(unsigned char *s);
+void b_ilprint(int v);
+void b_flprint(double v);
+void b_tlprint(int n);
+unsigned char *using(unsigned char *buf, unsigned char *fmt, ...);
+void b_input(unsigned char *prompt, ...);
+void b_linput(unsigned char *buf, int size);
+void locate(int x, int y);
+void b_csw(int sw);
+
+/* 文字列操作 */
+unsigned char *b_stradd(unsigned char *buf, ...);
+unsigned char *b_strncpy(int size, unsigned char *d, unsigned char *s);
+int b_strcmp(unsigned char *a, int op, unsigned char *b);
+unsigned char *b_strfS(unsigned char *buf, double v);      /* str$(float) */
+double pi(void);                                            /* pi() */
+
+/* bas2c.def の先頭にある組込関数 (hostgen.py で生成) */
+#include "basic0def.h"
+
+/* スタブ関数の呼び出し回数の記録 (hoststub.c) */
+void hoststub_hit(int n);
+
+#endif /* _BASIC0_H_ */
@@ -0,0 +1,768 @@
+/*
+ * hostlib.c - bas2c ホスト環境用ランタイム
+ *
+ * bas2c で変換した C ソースコードが呼び出す X-BASIC ランタイム (libbas) の関数を
+ * ホスト環境向けに実装したものです。
+ * 画面表示や文字列操作などの関数は実際に処理を行い、グラフィックやサウンドなどの
+ * ハードウェアを扱う関数は tools/hostgen.py で生成する hoststub.c で呼び出し回数を
+ * 数えるだけのスタブ関数として定義します。
+ */
+
+#include <stdarg.h>
+#include <time.h>
+#include <basic0.h>
+#include <basic.h>
+
+#define STRMAX      255         /* 文字列の最大長 */
+#define FILEMAX     32          /* 同時にオープンできるファイル数 */
+
+static int column;              /* 出力中の桁位置 */
+static FILE *filetbl[FILEMAX];
+
+/****************************************************************************/
+/* プログラムの開始/終了 */
+
+void b_init(void)
+{
+}
+
+void b_exit(int status)
+{
+	b_fcloseall();
+	fflush(stdout);
+	exit(status);
+}
+
+/****************************************************************************/
+/* print/input */
+
+static void output(FILE *fp, const unsigned char *s)
+{
+	for (; *s; s++) {
+		putc(*s, fp);
+		if (*s == '\n' || *s == '\r')
+			column = 0;
+		else if (*s == '\t')
+			column = (column + 8) & ~7;
+		else
+			column++;
+	}
+}
+
+static void fmtfloat(unsigned char *buf, double v)
+{
+	sprintf((char *)buf, "%.15g", v);
+}
+
+void b_sprint(unsigned char *s)
+{
+	output(stdout, s);
+}
+
+void b_iprint(int v)
+{
+	unsigned char buf[16];
+
+	sprintf((char *)buf, "%d", v);
+	output(stdout, buf);
+}
+
+void b_fprint(double v)
+{
+	unsigned char buf[32];
+
+	fmtfloat(buf, v);
+	output(stdout, buf);
+}
+
+void b_tprint(int n)
+{
+	while (column < n)
+		output(stdout, (unsigned char *)" ");
+}
+
+/* プリンタへの出力は標準エラー出力に送る */
+void b_slprint(unsigned char *s)
+{
+	output(stderr, s);
+}
+
+void b_ilprint(int v)
+{
+	fprintf(stderr, "%d", v);
+}
+
+void b_flprint(double v)
+{
+	unsigned char buf[32];
+
+	fmtfloat(buf, v);
+	output(stderr, buf);
+}
+
+void b_tlprint(int n)
+{
+	fprintf(stderr, "%*s", n, "");
+}
+
+/* print using の数値フィールドを文字列化する */
+static int fmtnum(unsigned char *d, const unsigned char *f, int len, double v)
+{
+	int left = 0, dec = -1, comma = 0, star = 0, lead = 0, trail = 0;
+	int width = len;
+	int neg = v < 0;
+	char num[350], r[400];
+	char *ip, *fp;
+	int i, j, n;
+
+	for (i = 0; i < len; i++) {
+		if (f[i] == '+' && i == 0)
+			lead = 1;
+		else if (f[i] == '*')
+			star = 1, left++;
+		else if (f[i] == '#' && dec < 0)
+			left++;
+		else if (f[i] == ',')
+			comma = 1, left++;
+		else if (f[i] == '.')
+			dec = 0;
+		else if (f[i] == '#')
+			dec++;
+		else if (f[i] == '+' || f[i] == '-')
+			trail = f[i];
+	}
+	sprintf(num, "%.*f", dec < 0 ? 0 : dec, fabs(v));
+	ip = num;
+	fp = strchr(num, '.');
+	if (fp)
+		*fp++ = '\0';
+
+	r[0] = '\0';
+	if (lead)
+		strcat(r, neg ? "-" : "+");
+	else if (neg && !trail)
+		strcat(r, "-");
+	if (!(left == 0 && strcmp(ip, "0") == 0)) {
+		n = strlen(ip);
+		j = strlen(r);
+		for (i = 0; i < n; i++) {
+			r[j++] = ip[i];
+			if (comma && i < n - 1 && (n - 1 - i) % 3 == 0)
+				r[j++] = ',';
+		}
+		r[j] = '\0';
+	}
+	if (dec >= 0) {
+		strcat(r, ".");
+		if (fp)
+			strcat(r, fp);
+	}
+	if (trail == '+')
+		strcat(r, neg ? "-" : "+");
+	else if (trail == '-')
+		strcat(r, neg ? "-" : " ");
+
+	n = strlen(r);
+	if (n > width) {
+		*d++ = '%';                 /* 桁あふれ */
+		memcpy(d, r, n);
+		return n + 1;
+	}
+	for (i = 0; i < width - n; i++)
+		*d++ = star ? '*' : ' ';
+	memcpy(d, r, n);
+	return width;
+}
+
+unsigned char *using(unsigned char *buf, unsigned char *fmt, ...)
+{
+	va_list ap;
+	unsigned char tmp[400];
+	unsigned char *d = tmp;
+	unsigned char *s;
+	int i, n;
+
+	va_start(ap, fmt);
+	while (*fmt && d < tmp + STRMAX) {
+		if (*fmt == '!') {
+			s = va_arg(ap, unsigned char *);
+			*d++ = *s ? *s : ' ';
+			fmt++;
+			continue;
+		}
+		if (*fmt == '&') {
+			for (n = 1; fmt[n] == ' '; n++)
+				;
+			if (fmt[n] == '&') {
+				s = va_arg(ap, unsigned char *);
+				for (i = 0; i <= n; i++)
+					*d++ = *s ? *s++ : ' ';
+				fmt += n + 1;
+				continue;
+			}
+		}
+		/* 数値フィールド +**##,##.##- */
+		n = 0;
+		if (fmt[n] == '+')
+			n++;
+		if (fmt[n] == '*' && fmt[n + 1] == '*')
+			n += 2;
+		while (fmt[n] == '#' || fmt[n] == ',')
+			n++;
+		if (fmt[n] == '.')
+			for (n++; fmt[n] == '#'; n++)
+				;
+		for (i = 0; i < n && fmt[i] != '#' && fmt[i] != '*'; i++)
+			;
+		if (i < n) {
+			if (fmt[0] != '+' && (fmt[n] == '+' || fmt[n] == '-'))
+				n++;
+			d += fmtnum(d, fmt, n, va_arg(ap, double));
+			fmt += n;
+			continue;
+		}
+		*d++ = *fmt++;
+	}
+	va_end(ap);
+	*d = '\0';
+	tmp[STRMAX] = '\0';
+	strcpy((char *)buf, (char *)tmp);
+	return buf;
+}
+
+void b_input(unsigned char *prompt, ...)
+{
+	va_list ap;
+	char line[1024];
+	char *p, *q;
+	int type;
+	void *v;
+
+	output(stdout, prompt);
+	fflush(stdout);
+	if (fgets(line, sizeof(line), stdin) == NULL)
+		line[0] = '\0';
+	line[strcspn(line, "\r\n")] = '\0';
+	column = 0;
+
+	p = line;
+	va_start(ap, prompt);
+	while ((type = va_arg(ap, int)) != -1) {
+		v = va_arg(ap, void *);
+		if ((q = strchr(p, ',')) != NULL)
+			*q = '\0';
+		switch (type) {
+		case 0x201:
+			*(unsigned char *)v = atoi(p);
+			break;
+		case 0x204:
+			*(int *)v = atoi(p);
+			break;
+		case 0x208:
+			*(double *)v = atof(p);
+			break;
+		default:                    /* 文字列変数 (typeはバッファのサイズ) */
+			b_strncpy(type, v, (unsigned char *)p);
+			break;
+		}
+		p = q ? q + 1 : p + strlen(p);
+	}
+	va_end(ap);
+}
+
+void b_linput(unsigned char *buf, int size)
+{
+	fflush(stdout);
+	if (fgets((char *)buf, size, stdin) == NULL)
+		buf[0] = '\0';
+	buf[strcspn((char *)buf, "\r\n")] = '\0';
+	column = 0;
+}
+
+void locate(int x, int y)
+{
+	column = x;
+}
+
+void b_csw(int sw)
+{
+}
+
+/****************************************************************************/
+/* 文字列操作 */
+
+unsigned char *b_stradd(unsigned char *buf, ...)
+{
+	va_list ap;
+	unsigned char tmp[STRMAX + 1];
+	unsigned char *s;
+	int n = 0;
+
+	va_start(ap, buf);
+	/* 引数の終わりは int の -1 で示される */
+	while ((unsigned int)(unsigned long)(s = va_arg(ap, unsigned char *)) != 0xffffffffU) {
+		while (*s && n < STRMAX)
+			tmp[n++] = *s++;
+	}
+	va_end(ap);
+	tmp[n] = '\0';
+	memcpy(buf, tmp, n + 1);
+	return buf;
+}
+
+unsigned char *b_strncpy(int size, unsigned char *d, unsigned char *s)
+{
+	int n = strlen((char *)s);
+
+	if (n > size - 1)
+		n = size - 1;
+	memmove(d, s, n);
+	d[n] = '\0';
+	return d;
+}
+
+int b_strcmp(unsigned char *a, int op, unsigned char *b)
+{
+	int r = strcmp((char *)a, (char *)b);
+
+	switch (op) {
+	case 0x3d20:    return r == 0;      /* = */
+	case 0x3c3e:    return r != 0;      /* <> */
+	case 0x3e20:    return r > 0;       /* > */
+	case 0x3c20:    return r < 0;       /* < */
+	case 0x3e3d:    return r >= 0;      /* >= */
+	case 0x3c3d:    return r <= 0;      /* <= */
+	}
+	return 0;
+}
+
+/****************************************************************************/
+/* 組込関数 */
+
+static struct tm *now(void)
+{
+	time_t t = time(NULL);
+	return localtime(&t);
+}
+
+unsigned char *b_dateS(unsigned char *buf)
+{
+	struct tm *tm = now();
+	sprintf((char *)buf, "%02d/%02d/%02d", tm->tm_year % 100, tm->tm_mon + 1, tm->tm_mday);
+	return buf;
+}
+
+unsigned char *b_timeS(unsigned char *buf)
+{
+	struct tm *tm = now();
+	sprintf((char *)buf, "%02d:%02d:%02d", tm->tm_hour, tm->tm_min, tm->tm_sec);
+	return buf;
+}
+
+unsigned char *b_dayS(unsigned char *buf)
+{
+	static const char *day[] = { "Sun", "Mon", "Tue", "Wed", "Thu", "Fri", "Sat" };
+	strcpy((char *)buf, day[now()->tm_wday]);
+	return buf;
+}
+
+unsigned char *b_inkey0(unsigned char *buf)
+{
+	int c;
+
+	fflush(stdout);
+	c = getchar();
+	buf[0] = c == EOF ? '\0' : c;
+	buf[1] = '\0';
+	return buf;
+}
+
+unsigned char *b_striS(unsigned char *buf, int v)
+{
+	sprintf((char *)buf, "%d", v);
+	return buf;
+}
+
+unsigned char *b_strfS(unsigned char *buf, double v)
+{
+	fmtfloat(buf, v);
+	return buf;
+}
+
+unsigned char *b_spaceS(unsigned char *buf, int n)
+{
+	if (n < 0)
+		n = 0;
+	if (n > STRMAX)
+		n = STRMAX;
+	memset(buf, ' ', n);
+	buf[n] = '\0';
+	return buf;
+}
+
+int b_free(void)
+{
+	return 0x100000;
+}
+
+int csrlin(void)
+{
+	return 0;
+}
+
+int pos(void)
+{
+	return column;
+}
+
+double b_pi(double x)
+{
+	return M_PI * x;
+}
+
+double pi(void)
+{
+	return M_PI;
+}
+
+int b_int(double x)
+{
+	return (int)floor(x);
+}
+
+/****************************************************************************/
+/* [BASIC] 数値/文字変換 */
+
+int asc(unsigned char *s)
+{
+	return *s;
+}
+
+static unsigned char *radix(unsigned char *buf, unsigned int v, int base)
+{
+	unsigned char tmp[40];
+	int n = 0;
+
+	do {
+		tmp[n++] = "0123456789ABCDEF"[v % base];
+		v /= base;
+	} while (v);
+	while (n > 0)
+		*buf++ = tmp[--n];
+	*buf = '\0';
+	return buf;
+}
+
+unsigned char *b_binS(unsigned char *buf, int v)
+{
+	radix(buf, v, 2);
+	return buf;
+}
+
+unsigned char *b_hexS(unsigned char *buf, int v)
+{
+	radix(buf, v, 16);
+	return buf;
+}
+
+unsigned char *b_octS(unsigned char *buf, int v)
+{
+	radix(buf, v, 8);
+	return buf;
+}
+
+unsigned char *b_chrS(unsigned char *buf, int c)
+{
+	buf[0] = c;
+	buf[1] = '\0';
+	return buf;
+}
+
+unsigned char *b_itoa(unsigned char *buf, int v)
+{
+	sprintf((char *)buf, "%d", v);
+	return buf;
+}
+
+double fix(double x)
+{
+	return x < 0 ? ceil(x) : floor(x);
+}
+
+double val(unsigned char *s)
+{
+	while (*s == ' ')
+		s++;
+	if (s[0] == '&') {
+		switch (toupper(s[1])) {
+		case 'H':   return strtol((char *)s + 2, NULL, 16);
+		case 'O':   return strtol((char *)s + 2, NULL, 8);
+		case 'B':   return strtol((char *)s + 2, NULL, 2);
+		}
+	}
+	return atof((char *)s);
+}
+
+/****************************************************************************/
+/* [BASIC] 数学関数 */
+
+void randomize(int seed)
+{
+	srand(seed);
+}
+
+double rnd(void)
+{
+	return rand() / (RAND_MAX + 1.0);
+}
+
+double sgn(double x)
+{
+	return x > 0 ? 1 : x < 0 ? -1 : 0;
+}
+
+/****************************************************************************/
+/* [BASIC] 文字列関数 */
+
+int instr(int start, unsigned char *s, unsigned char *t)
+{
+	char *p;
+
+	if (start < 1)
+		start = 1;
+	if (start > (int)strlen((char *)s))
+		return 0;
+	p = strstr((char *)s + start - 1, (char *)t);
+	return p ? p - (char *)s + 1 : 0;
+}
+
+unsigned char *b_leftS(unsigned char *buf, unsigned char *s, int n)
+{
+	if (n < 0)
+		n = 0;
+	return b_strncpy(n + 1, buf, s);
+}
+
+unsigned char *b_midS(unsigned char *buf, unsigned char *s, int start, int n)
+{
+	int l = strlen((char *)s);
+
+	if (start < 1)
+		start = 1;
+	if (start > l) {
+		buf[0] = '\0';
+		return buf;
+	}
+	return b_leftS(buf, s + start - 1, n);
+}
+
+unsigned char *b_rightS(unsigned char *buf, unsigned char *s, int n)
+{
+	int l = strlen((char *)s);
+
+	if (n > l)
+		n = l;
+	if (n < 0)
+		n = 0;
+	return b_strncpy(STRMAX + 1, buf, s + l - n);
+}
+
+unsigned char *b_mirrorS(unsigned char *buf, unsigned char *s)
+{
+	b_strncpy(STRMAX + 1, buf, s);
+	return strrev(buf);
+}
+
+unsigned char *b_stringS(unsigned char *buf, int n, unsigned char *s)
+{
+	if (n < 0)
+		n = 0;
+	if (n > STRMAX)
+		n = STRMAX;
+	memset(buf, *s, n);
+	buf[*s ? n : 0] = '\0';
+	return buf;
+}
+
+int b_strchr(unsigned char *s, int c)
+{
+	char *p = strchr((char *)s, c);
+	return p ? p - (char *)s + 1 : 0;
+}
+
+int b_strrchr(unsigned char *s, int c)
+{
+	char *p = strrchr((char *)s, c);
+	return p ? p - (char *)s + 1 : 0;
+}
+
+unsigned char *b_strtok(unsigned char *s, unsigned char *d)
+{
+	char *p = strtok(*s ? (char *)s : NULL, (char *)d);
+	return (unsigned char *)(p ? p : "");
+}
+
+unsigned char *strlwr(unsigned char *s)
+{
+	unsigned char *p;
+
+	for (p = s; *p; p++)
+		*p = tolower(*p);
+	return s;
+}
+
+unsigned char *strupr(unsigned char *s)
+{
+	unsigned char *p;
+
+	for (p = s; *p; p++)
+		*p = toupper(*p);
+	return s;
+}
+
+unsigned char *strrev(unsigned char *s)
+{
+	int i, j;
+	unsigned char c;
+
+	for (i = 0, j = strlen((char *)s) - 1; i < j; i++, j--) {
+		c = s[i];
+		s[i] = s[j];
+		s[j] = c;
+	}
+	return s;
+}
+
+unsigned char *strset(unsigned char *s, int c)
+{
+	memset(s, c, strlen((char *)s));
+	return s;
+}
+
+unsigned char *strnset(unsigned char *s, int c, int n)
+{
+	int l = strlen((char *)s);
+
+	memset(s, c, n < l ? n : l);
+	return s;
+}
+
+/****************************************************************************/
+/* [BASIC] ファイル操作 */
+
+int b_fopen(unsigned char *name, unsigned char *mode)
+{
+	const char *m = "rb";
+	int i;
+
+	if (strchr((char *)mode, 'c'))
+		m = "w+b";
+	else if (strchr((char *)mode, 'a'))
+		m = "ab";
+	else if (strchr((char *)mode, 'w'))
+		m = "r+b";
+	for (i = 5; i < FILEMAX; i++) {
+		if (filetbl[i] == NULL) {
+			if ((filetbl[i] = fopen((char *)name, m)) == NULL)
+				return -1;
+			return i;
+		}
+	}
+	return -1;
+}
+
+static FILE *getfp(int fp)
+{
+	return (fp >= 0 && fp < FILEMAX) ? filetbl[fp] : NULL;
+}
+
+int b_fclose(int fp)
+{
+	FILE *f = getfp(fp);
+
+	if (f == NULL)
+		return -1;
+	filetbl[fp] = NULL;
+	return fclose(f);
+}
+
+int b_fcloseall(void)
+{
+	int i;
+
+	for (i = 0; i < FILEMAX; i++)
+		b_fclose(i);
+	return 0;
+}
+
+int b_feof(int fp)
+{
+	FILE *f = getfp(fp);
+	int c;
+
+	if (f == NULL)
+		return -1;
+	if ((c = getc(f)) == EOF)
+		return -1;
+	ungetc(c, f);
+	return 0;
+}
+
+int b_fgetc(int fp)
+{
+	FILE *f = getfp(fp);
+	return f ? getc(f) : -1;
+}
+
+int b_fputc(int c, int fp)
+{
+	FILE *f = getfp(fp);
+	return f ? putc(c, f) : -1;
+}
+
+int b_fread(void *a, int size, int n, int fp)
+{
+	FILE *f = getfp(fp);
+	return f ? (int)fread(a, size, n, f) : -1;
+}
+
+int b_fwrite(void *a, int size, int n, int fp)
+{
+	FILE *f = getfp(fp);
+	return f ? (int)fwrite(a, size, n, f) : -1;
+}
+
+int b_freads(unsigned char *buf, int size, int fp)
+{
+	FILE *f = getfp(fp);
+
+	if (f == NULL || fgets((char *)buf, size, f) == NULL)
+		return -1;
+	buf[strcspn((char *)buf, "\r\n")] = '\0';
+	return 0;
+}
+
+int b_fwrites(unsigned char *s, int fp)
+{
+	FILE *f = getfp(fp);
+	return f ? fputs((char *)s, f) : -1;
+}
+
+int b_fseek(int fp, int offset, int whence)
+{
+	FILE *f = getfp(fp);
+
+	if (f == NULL || fseek(f, offset, whence) != 0)
+		return -1;
+	return ftell(f);
+}
+
+int frename(unsigned char *from, unsigned char *to)
+{
+	return rename((char *)from, (char *)to);
+}
+
+int fdelete(unsigned char *name)
+{
+	return remove((char *)name);
+}
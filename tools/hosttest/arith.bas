@@ -0,0 +1,5 @@
+10 int i
+20 for i=-9 to 9
+30 print i\4;i mod 8;i*8;i shl 0;i\1
+40 next
+50 print 0 shl i;i shr 1
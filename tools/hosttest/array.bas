@@ -0,0 +1,14 @@
+10 int i,j,s
+20 dim int m(3,4)
+30 for i=0 to 3
+40 for j=0 to 4
+50 m(i,j)=i*10+j
+60 next
+70 next
+80 s=0
+90 for i=0 to 3
+100 for j=0 to 4
+110 s=s+m(i,j)*m(3-i,j)
+120 next
+130 next
+140 print s
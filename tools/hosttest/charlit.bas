@@ -0,0 +1,8 @@
+10 int a
+20 a=34
+30 if a='"' then print "x"
+40 print "x";"y"
+50 a=65
+60 if a='"' then print "quote" else print "other"
+70 print "x";'"'
+80 if '"'=a+1 then print "x" else print "y";"z"
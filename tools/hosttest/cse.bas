@@ -0,0 +1,28 @@
+10 float a,b,c
+20 int i
+30 dim int t(5)
+40 str s
+50 a=2
+60 b=sqr(a)*sqr(a)+sqr(a)
+70 print b
+80 for i=1 to 3
+90 c=sin(a*i)*sin(a*i)+cos(a*i)*cos(a*i)
+100 print c
+110 next
+120 t(1)=3
+130 print abs(t(1)-5)+abs(t(1)-5)
+140 print "s";len("abc")+len("abc")
+150 s="xyz"
+160 print len(s)*len(s)+asc(s)
+170 print rnd2(3)+rnd2(3)
+180 print dist(3,4)
+190 end
+1000 func float dist(x;float,y;float)
+1010 dim float v(2)
+1020 v(0)=x:v(1)=y
+1030 return(sqr(v(0)*v(0)+v(1)*v(1))+sqr(v(0)*v(0)+v(1)*v(1)))
+1040 endfunc
+1050 func rnd2(n)
+1060 t(2)=t(2)+n
+1070 return(t(2))
+1080 endfunc
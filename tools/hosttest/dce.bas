@@ -0,0 +1,15 @@
+10 int a,b,unused
+20 a=1
+30 goto 60
+40 a=2
+50 print "never"
+60 print a
+70 gosub 200
+80 end
+200 b=a*3
+210 print b
+220 return
+1000 func deadf(x)
+1010 print "dead func"
+1020 return(x)
+1030 endfunc
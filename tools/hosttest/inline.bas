@@ -0,0 +1,23 @@
+10 int y
+20 float z
+30 z=half(3)
+40 print z
+50 y=addc(1)
+60 print y
+70 gosub 500
+80 y=sq(4)
+90 print y
+100 end
+500 print "sub";y
+510 return
+1000 func int half(a;float)
+1010 return(a/2)
+1020 endfunc
+1030 func addc(a)
+1040 char b
+1050 b='a'
+1060 return(b+a)
+1070 endfunc
+1080 func sq(a)
+1090 return(a*a)
+1100 endfunc
@@ -0,0 +1,11 @@
+10 int i,j
+20 char c
+30 i=2000000000
+40 if i*2.0>0 then print "pos" else print "neg"
+50 c=200
+60 if c*2.0>300 then print "c big"
+70 j=i*1.0+5
+80 print j
+90 for i=1 to 3:j=i*3.0-1:print j;:next
+100 print
+110 if -(2.0+1)<0 then print "neg const"
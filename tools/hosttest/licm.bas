@@ -0,0 +1,17 @@
+10 int i,n,s
+20 float x
+30 x=16
+40 n=0
+50 while n<fix(sqr(x))
+60 s=s+fix(sqr(x))
+70 n=n+1
+80 endwhile
+90 print s
+100 for i=1 to fix(sqr(x))*2
+110 s=s+abs(-i)
+120 next
+130 print s
+140 repeat
+150 x=x-1
+160 until x<sqr(9)
+170 print x
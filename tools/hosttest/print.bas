@@ -0,0 +1,12 @@
+10 int i
+20 dim int a(3),b(3)
+30 print "abc";"def"
+40 print "abc";1;"x"
+50 for i=0 to 2
+60 print "abc",i
+70 next
+80 print using "###.##";3.14159
+90 print using "&  &";"hello"
+100 a={1,2,3,4}
+110 b={1,2,3,4}
+120 print a(3)+b(2)
@@ -0,0 +1,23 @@
+10 int g
+20 g=10
+30 print outer(5)
+40 print outer2(5)
+50 end
+100 g=g*2
+110 print g
+120 return
+1000 func f()
+1010 return(g+1)
+1020 endfunc
+1030 func outer(a)
+1040 int g,r
+1050 g=a
+1060 r=f()
+1070 return(r)
+1080 endfunc
+1090 func outer2(a)
+1100 int g
+1110 g=a
+1120 gosub 100
+1130 return(g)
+1140 endfunc
@@ -0,0 +1,10 @@
+10 str s,t
+20 int i
+30 s=""
+40 for i=1 to 5
+50 s=s+chr$(64+i)+","
+60 next
+70 t="x":t=t+s+t
+80 print s:print t
+90 s=s+s
+100 print s;len(s)
@@ -0,0 +1,9 @@
+10 str s
+20 s="abc"
+30 if s="abc" then print "eq1"
+40 if s<>"abd" then print "ne1"
+50 if s="" then print "empty" else print "nonempty"
+60 s=""
+70 if s="" then print "empty2"
+80 if s<"b" then print "lt"
+90 if "abc"=s then print "never"
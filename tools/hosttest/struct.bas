@@ -0,0 +1,17 @@
+10 int i,j,s
+20 i=0:s=0
+30 i=i+1
+40 s=s+i
+50 if i<10 then goto 30
+60 print s
+70 j=0
+80 if j>=5 then goto 120
+90 print j;
+100 j=j+1
+110 goto 80
+120 print ""
+130 if s>50 then goto 160
+140 print "small"
+150 goto 170
+160 print "big"
+170 end
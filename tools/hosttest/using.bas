@@ -0,0 +1,8 @@
+10 float f
+20 int i
+30 for i=1 to 4
+40 f=i*1.25-2
+50 print using "###.## ####";f,i
+60 next
+70 print using "&    &";"abcdefgh"
+80 print using "+###";42